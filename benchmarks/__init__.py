@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Fall back to the pipeline modules in `src/` when they are not installed in the benchmark environment
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
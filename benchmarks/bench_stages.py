@@ -0,0 +1,187 @@
+"""
+Time and peak memory of each pipeline stage on synthetic data at 1x, 10x and 100x production volume.
+Run with `asv run` (see `asv.conf.json`); `peakmem_*` includes the synthetic data held in memory.
+"""
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from . import synthetic
+
+SCALES = [1, 10, 100]
+
+# The business listing is benchmarked at its own (small) scales; see `synthetic.MAX_REGISTRY_SCALE`
+REGISTRY_SCALES = [1, 2]
+
+
+class StageBenchmark:
+    """
+    Runs every benchmark inside a scratch `<tmp>/src` working directory so the stages'
+    relative `../data/...` reads and writes stay out of the repository.
+    """
+    params = SCALES
+    param_names = ['scale']
+    timeout = 1800
+
+    def setup(self, scale):
+        self.cwd = os.getcwd()
+        self.scratch = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.scratch, 'data'))
+        os.makedirs(os.path.join(self.scratch, 'src'))
+        os.chdir(os.path.join(self.scratch, 'src'))
+
+    def teardown(self, scale):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+
+class NaicsAggregation(StageBenchmark):
+    def setup(self, scale):
+        super().setup(scale)
+        self.all_data = synthetic.make_all_naics_data(scale)
+        self.opp_naics = synthetic.make_opp_naics(scale)
+
+    def time_create_final_df(self, scale):
+        import naics_code_data_generation
+        naics_code_data_generation.create_final_df(self.all_data, self.opp_naics)
+
+    def peakmem_create_final_df(self, scale):
+        import naics_code_data_generation
+        naics_code_data_generation.create_final_df(self.all_data, self.opp_naics)
+
+    def time_get_published_counts(self, scale):
+        import opportunity_counts
+        opportunity_counts.get_published_counts(self.opp_naics)
+
+    def time_data_to_business_enterprise(self, scale):
+        import naics_code_data_generation
+        naics_code_data_generation.data_to_business_enterprise(self.all_data)
+
+    def peakmem_data_to_business_enterprise(self, scale):
+        import naics_code_data_generation
+        naics_code_data_generation.data_to_business_enterprise(self.all_data)
+
+
+class ReadApi(StageBenchmark):
+    def setup(self, scale):
+        super().setup(scale)
+        import naics_code_data_generation
+        naics_code_data_generation.create_final_df(synthetic.make_all_naics_data(scale), synthetic.make_opp_naics(scale))
+        self.query = 'Opportunity_NAICS_2=23&sort=-Number of Opportunities&limit=50'
+
+    def time_query_uncached(self, scale):
+        import read_api
+        read_api.run_query.cache_clear()
+        read_api.handle('GET', '/tables/naics_analysis', self.query)
+
+    def time_query_cached(self, scale):
+        import read_api
+        read_api.handle('GET', '/tables/naics_analysis', self.query)
+
+
+class VendorResolution(StageBenchmark):
+    def setup(self, scale):
+        super().setup(scale)
+        self.awards = synthetic.make_awards(scale)
+
+    def time_resolve_vendors(self, scale):
+        import vendor_resolution
+        vendor_resolution.resolve_vendors(self.awards)
+
+    def peakmem_resolve_vendors(self, scale):
+        import vendor_resolution
+        vendor_resolution.resolve_vendors(self.awards)
+
+
+class AwardQuantiles(StageBenchmark):
+    def setup(self, scale):
+        super().setup(scale)
+        import sketches
+        self.all_data = synthetic.make_all_naics_data(scale)
+        self.all_data['bid_due_year_month'] = pd.to_datetime(self.all_data['Opportunity__r.Bid_Due__c'], utc=True).dt.strftime('%Y-%m')
+        self.sketches = sketches.build_sketches(self.all_data)
+
+    def time_build_sketches(self, scale):
+        import sketches
+        sketches.build_sketches(self.all_data)
+
+    def peakmem_build_sketches(self, scale):
+        import sketches
+        sketches.build_sketches(self.all_data)
+
+    def time_get_published_quantiles(self, scale):
+        import sketches
+        sketches.get_published_quantiles(self.sketches)
+
+
+class Geography(StageBenchmark):
+    params = REGISTRY_SCALES
+    param_names = ['registry_scale']
+
+    def setup(self, scale):
+        super().setup(scale)
+        self.all_biz = synthetic.make_businesses(scale)
+        self.city_zips, self.county_zips, self.county_names = synthetic.make_zip_lists()
+
+    def time_separate_businesses(self, scale):
+        import geography
+        geography.separate_businesses(self.all_biz, self.city_zips, self.county_zips, self.county_names)
+
+    def peakmem_separate_businesses(self, scale):
+        import geography
+        geography.separate_businesses(self.all_biz, self.city_zips, self.county_zips, self.county_names)
+
+
+class Disparity(StageBenchmark):
+    def setup(self, scale):
+        super().setup(scale)
+        import geography
+        self.all_data = synthetic.make_all_naics_data(scale)
+        self.zip_lists = synthetic.make_zip_lists()
+        self.business_counts = geography.get_business_naics_info(
+            *geography.separate_businesses(synthetic.make_businesses(), *self.zip_lists)
+        )
+
+    def time_compute_disparity(self, scale):
+        import disparity
+        disparity.compute_disparity(self.all_data, self.zip_lists, self.business_counts)
+
+    def peakmem_compute_disparity(self, scale):
+        import disparity
+        disparity.compute_disparity(self.all_data, self.zip_lists, self.business_counts)
+
+
+class Temporal(StageBenchmark):
+    def setup(self, scale):
+        super().setup(scale)
+        self.all_data = synthetic.make_all_data(scale)
+        self.months = sorted(self.all_data.bid_due_year_month.unique())
+
+    def time_get_percents(self, scale):
+        import temporal
+        temporal.get_percents(self.all_data, self.months, "bid_due_year_month")
+
+    def peakmem_get_percents(self, scale):
+        import temporal
+        temporal.get_percents(self.all_data, self.months, "bid_due_year_month")
+
+
+class Geocoding(StageBenchmark):
+    def setup(self, scale):
+        super().setup(scale)
+        import additional_naics_data_processing
+        self.all_data, self.reduced_df, _ = additional_naics_data_processing.format_data(synthetic.make_all_data(scale))
+        synthetic.write_geocode_responses(
+            synthetic.make_geocode_responses(self.reduced_df),
+            '../data/arcgis_latlong_data.json'
+        )
+
+    def time_add_loc_data(self, scale):
+        import additional_naics_data_processing
+        additional_naics_data_processing.add_loc_data(self.reduced_df, self.all_data)
+
+    def peakmem_add_loc_data(self, scale):
+        import additional_naics_data_processing
+        additional_naics_data_processing.add_loc_data(self.reduced_df, self.all_data)
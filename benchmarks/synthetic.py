@@ -0,0 +1,235 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Approximate production volume (scale 1) of each dataset
+PRODUCTION_VOLUME = {
+    'opportunities': 8000,
+    'awards': 20000,
+    'vendors': 5000,
+    'businesses': 550000,
+}
+
+# The business listing covers every registered business in the City, so it doesn't grow with
+# procurement volume; `make_businesses` takes its own scale, capped at this
+MAX_REGISTRY_SCALE = 2
+
+NAICS_SECTORS = [
+    '11', '21', '22', '23', '31', '32', '33', '42', '44', '45', '48', '49',
+    '51', '52', '53', '54', '55', '56', '61', '62', '71', '72', '81', '92',
+]
+N_NAICS_CODES = 1200
+
+DEPARTMENTS = [
+    'General Services', 'Public Works, Bureau of Engineering', 'Transportation', 'Police',
+    'Fire', 'Recreation and Parks', 'Information Technology Agency', 'Sanitation',
+    'Water & Power', 'Airports, Los Angeles World', 'Harbor Department, Port of Los Angeles',
+]
+CATEGORIES = ['Commodity', 'Construction', 'Personal Services']
+STREET_NAMES = [
+    'Main', 'Spring', 'Broadway', 'Figueroa', 'Olympic', 'Pico', 'Wilshire', 'Sunset',
+    'Vermont', 'Western', 'Alameda', 'Central', 'Crenshaw', 'Sepulveda', 'Ventura', 'Stanford',
+]
+STREET_TYPES = ['St', 'Street', 'Ave', 'Avenue', 'Blvd', 'Boulevard', 'Way', 'Dr']
+OTHER_STATES = ['NV', 'AZ', 'TX', 'NY', 'WA', 'IL', 'OR']
+
+# Rough bounding box of LA County (lon, lat)
+LA_BBOX = (-118.95, 33.70, -117.65, 34.82)
+
+
+def get_rng(seed: int = 0) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def make_naics_codes(rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Returns a pool of 6-digit NAICS codes, their descriptions and Zipf-like usage weights.
+    """
+    sectors = rng.choice(NAICS_SECTORS, N_NAICS_CODES)
+    suffixes = rng.choice(10000, N_NAICS_CODES, replace=False)
+    codes = pd.Series(sectors).str.cat(pd.Series(suffixes).astype(str).str.zfill(4))
+    weights = 1 / np.arange(1, N_NAICS_CODES + 1) ** 1.1
+    return pd.DataFrame({
+        'code': codes,
+        'description': 'Industry ' + codes,
+        'weight': weights / weights.sum(),
+    }).drop_duplicates(subset='code').reset_index(drop=True)
+
+
+def make_zip_lists(rng: np.random.Generator = None):
+    """
+    Returns synthetic LA City zip codes, LA County zip codes and LA County city names
+    (the shape of `geography.get_zip_codes`).
+    """
+    city_zips = np.array(['900{:02d}'.format(i) for i in range(1, 100)])
+    county_zips = np.array([str(z) for z in range(90501, 90900)] + [str(z) for z in range(91001, 91400)])
+    county_names = np.array(['countycity{}'.format(i) for i in range(88)])
+    return city_zips, county_zips, county_names
+
+
+def make_opp_naics(scale: int = 1, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns NAICS_Opportunity records as pulled from Salesforce (one row per opportunity x NAICS code).
+    """
+    rng = get_rng(seed)
+    naics = make_naics_codes(rng)
+    n_opps = PRODUCTION_VOLUME['opportunities'] * scale
+
+    # Every opportunity has 1+ NAICS codes
+    n_codes = 1 + rng.poisson(1.5, n_opps)
+    opp_idx = np.repeat(np.arange(n_opps), n_codes)
+    code_idx = rng.choice(len(naics), len(opp_idx), p=naics['weight'].to_numpy())
+
+    opp_department = rng.choice(DEPARTMENTS, n_opps, p=[0.12] * 8 + [0.02, 0.01, 0.01])
+    opp_category = rng.choice(CATEGORIES, n_opps, p=[0.7, 0.2, 0.1])
+    bid_due = pd.Timestamp('2016-07-02', tz='UTC') + pd.to_timedelta(rng.integers(0, 365 * 5, n_opps), unit='D')
+    bid_post = bid_due - pd.to_timedelta(rng.integers(14, 90, n_opps), unit='D')
+
+    return pd.DataFrame({
+        'Opportunity__r.Id': pd.Series(opp_idx).map('a0B{:012d}'.format).to_numpy(),
+        'Opportunity__r.Account.Name': opp_department[opp_idx],
+        'NAICS_Code__r.Name': naics['code'].to_numpy()[code_idx],
+        'NAICS_Code__r.NAICS_Description__c': naics['description'].to_numpy()[code_idx],
+        'Opportunity__r.Category__c': opp_category[opp_idx],
+        'Opportunity__r.Bid_Due__c': bid_due[opp_idx].strftime('%Y-%m-%dT%H:%M:%S.000+0000'),
+        'Opportunity__r.Bid_Post__c': bid_post[opp_idx].strftime('%Y-%m-%dT%H:%M:%S.000+0000'),
+    }).drop_duplicates(subset=['Opportunity__r.Id', 'NAICS_Code__r.Name']).reset_index(drop=True)
+
+
+def make_vendors(rng: np.random.Generator, n_vendors: int) -> pd.DataFrame:
+    """
+    Returns vendor accounts with billing addresses (mostly LA City/County, some out of state).
+    """
+    city_zips, county_zips, county_names = make_zip_lists()
+    location = rng.choice(3, n_vendors, p=[0.5, 0.3, 0.2])
+    state = np.where(location == 2, rng.choice(OTHER_STATES, n_vendors), 'CA')
+    city = np.where(
+        location == 0, 'Los Angeles',
+        np.where(location == 1, rng.choice(county_names, n_vendors), 'Elsewhere')
+    )
+    zip_code = np.where(
+        location == 0, rng.choice(city_zips, n_vendors),
+        np.where(location == 1, rng.choice(county_zips, n_vendors), rng.integers(10000, 89999, n_vendors).astype(str))
+    )
+    street = (
+        pd.Series(rng.integers(1, 25000, n_vendors)).astype(str)
+        + ' ' + rng.choice(STREET_NAMES, n_vendors)
+        + ' ' + rng.choice(STREET_TYPES, n_vendors)
+        + np.where(rng.random(n_vendors) < 0.3, ' Suite ' + pd.Series(rng.integers(1, 999, n_vendors)).astype(str), '')
+    )
+    return pd.DataFrame({
+        'Account__r.BillingStreet': street.to_numpy(),
+        'Account__r.BillingPostalCode': zip_code,
+        'Account__r.BillingCity': city,
+        'Account__r.BillingState': state,
+        'Account__r.Name': pd.Series(np.arange(n_vendors)).map('Vendor {} LLC'.format).to_numpy(),
+    })
+
+
+def make_awards(scale: int = 1, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns Award__c records as pulled from Salesforce (one row per award).
+    """
+    rng = get_rng(seed + 1)
+    n_awards = PRODUCTION_VOLUME['awards'] * scale
+    n_opps = PRODUCTION_VOLUME['opportunities'] * scale
+    vendors = make_vendors(rng, PRODUCTION_VOLUME['vendors'] * scale)
+
+    # Vendors win awards with a skewed frequency
+    vendor_idx = np.minimum(rng.zipf(1.5, n_awards) - 1, len(vendors) - 1)
+    awards = vendors.iloc[rng.permutation(len(vendors))[vendor_idx]].reset_index(drop=True)
+    awards['Award_Amount__c'] = np.round(rng.lognormal(11, 2, n_awards), 2)
+    awards['Contract_Award_ID__c'] = pd.Series(np.arange(n_awards)).map('C-{:08d}'.format).to_numpy()
+    awards['DBE__c'] = rng.random(n_awards) < 0.05
+    awards['MBE__c'] = rng.random(n_awards) < 0.12
+    awards['WBE__c'] = rng.random(n_awards) < 0.08
+    opp_idx = rng.integers(0, n_opps, n_awards)
+    awards['Opportunity__r.Id'] = pd.Series(opp_idx).map('a0B{:012d}'.format).to_numpy()
+    awards['Opportunity__r.Name'] = pd.Series(opp_idx).map('Opportunity {}'.format).to_numpy()
+    return awards
+
+
+def make_all_naics_data(scale: int = 1, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns awards joined to their opportunities' NAICS codes with DWP, LAWA, and POLA removed
+    (the shape of `all_data` in `naics_code_data_generation.py`).
+    """
+    merged = (
+        make_awards(scale, seed)
+        .merge(make_opp_naics(scale, seed), on='Opportunity__r.Id')
+        .rename(columns={'NAICS_Code__r.Name': 'Opportunity_NAICS'})
+    )
+    return merged[~merged['Opportunity__r.Account.Name'].isin(DEPARTMENTS[-3:])].reset_index(drop=True)
+
+
+def make_all_data(scale: int = 1, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns one row per award with bid year/month columns (the shape of the `all_data` artifact).
+    """
+    all_data = (
+        make_all_naics_data(scale, seed)
+        .drop(columns=['Opportunity_NAICS', 'NAICS_Code__r.NAICS_Description__c'])
+        .drop_duplicates()
+        .reset_index(drop=True)
+    )
+    bid_due = pd.to_datetime(all_data['Opportunity__r.Bid_Due__c'], utc=True)
+    all_data['bid_due_year'] = bid_due.dt.year
+    all_data['bid_due_year_month'] = bid_due.dt.strftime('%Y-%m')
+    return all_data
+
+
+def make_businesses(registry_scale: int = 1, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns active business listings after `geography.get_all_business_data` preprocessing.
+    `registry_scale` is independent of the procurement scale and capped at MAX_REGISTRY_SCALE.
+    """
+    rng = get_rng(seed + 2)
+    n = PRODUCTION_VOLUME['businesses'] * min(registry_scale, MAX_REGISTRY_SCALE)
+    city_zips, county_zips, county_names = make_zip_lists()
+    naics = make_naics_codes(get_rng(seed))
+
+    location = rng.choice(3, n, p=[0.6, 0.3, 0.1])
+    zip5 = np.where(
+        location == 0, rng.choice(city_zips, n),
+        np.where(location == 1, rng.choice(county_zips, n), rng.integers(10000, 89999, n).astype(str))
+    )
+    city = np.where(
+        location == 0, 'losangeles',
+        np.where(location == 1, rng.choice(county_names, n), 'elsewhere')
+    )
+    naics_code = np.where(rng.random(n) < 0.15, '999999', naics['code'].to_numpy()[rng.integers(0, len(naics), n)])
+    return pd.DataFrame({
+        'STREET': rng.choice(STREET_NAMES, n),
+        'CITY': city,
+        'ZIP9': pd.Series(zip5).str.cat(pd.Series(rng.integers(0, 9999, n)).astype(str).str.zfill(4), sep='-').to_numpy(),
+        'NAICS': naics_code,
+        'ZIP5': zip5,
+    })
+
+
+def make_geocode_responses(reduced_df: pd.DataFrame, seed: int = 0, unmatched_rate: float = 0.05) -> list:
+    """
+    Returns ArcGIS `geocodeAddresses` locations for the addresses in `reduced_df` (from `format_data`),
+    in shuffled order with a share of unmatched ('U') results.
+    """
+    rng = get_rng(seed + 3)
+    n = len(reduced_df)
+    x = rng.uniform(LA_BBOX[0], LA_BBOX[2], n)
+    y = rng.uniform(LA_BBOX[1], LA_BBOX[3], n)
+    unmatched = rng.random(n) < unmatched_rate
+    order = rng.permutation(n)
+    object_ids = reduced_df['OBJECTID'].to_numpy()
+    return [
+        {
+            'address': '',
+            'location': {'x': float(x[i]), 'y': float(y[i])} if not unmatched[i] else {'x': 'NaN', 'y': 'NaN'},
+            'score': 0 if unmatched[i] else 100,
+            'attributes': {'ResultID': int(object_ids[i]), 'Status': 'U' if unmatched[i] else 'M', 'Score': 0 if unmatched[i] else 100},
+        }
+        for i in order
+    ]
+
+
+def write_geocode_responses(locations: list, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(locations, f)
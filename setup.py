@@ -1,8 +1,15 @@
+import os
 from setuptools import find_packages, setup
 
 setup(
     name='src',
-    packages=find_packages(),
+    packages=find_packages('src'),
+    # The pipeline scripts in `src/` are top-level modules (they import each other as `import save_files`)
+    package_dir={'': 'src'},
+    py_modules=[os.path.splitext(f)[0] for f in os.listdir('src') if f.endswith('.py')],
+    entry_points={
+        'console_scripts': ['procurement=cli:main'],
+    },
     version='0.1.0',
     description='A short description of the project.',
     author='City of LA',
@@ -13,6 +13,10 @@ import re
 import json
 import time
 import requests
+import local_geocoder
+import artifacts
+import map_export
+import instrumentation
 
 
 # ---
@@ -60,12 +64,11 @@ def refresh_access_token(filename) -> None:
 
 # ### Data Extraction
 
-# Read in generated data from previous notebook
-all_data = pd.read_csv('../data/all_data.csv')
-
 def format_data(all_data: pd.DataFrame) -> list:
     """
     Formatting the data from the `all_data` dataframe into the correct format for the request payload.
+    Every distinct billing address gets a stable int64 `Address ID` (in order of first appearance) that is
+    sent to ArcGIS as `OBJECTID` and comes back as `ResultID`. Rows with an incomplete address get -1.
     
     End payload to look like:
     [{'attributes': {'OBJECTID': 1,
@@ -77,25 +80,35 @@ def format_data(all_data: pd.DataFrame) -> list:
        'City': 'Los Angeles',
        'Region': 'CA'}}]
     """
+    # Assigning the address key to every row of `all_data`
+    all_data = all_data.assign(**{
+        'Address ID': (
+            all_data
+            .groupby(['Account__r.BillingStreet', 'Account__r.BillingCity', 'Account__r.BillingState'], sort=False)
+            .ngroup()
+            .fillna(-1)
+            .astype('int64')
+        )
+    })
+
     # Making temp dataframe
     reduced_and_relabeled = (
-        all_data[[
+        all_data.loc[all_data['Address ID'] >= 0, [
+            'Address ID',
             'Account__r.BillingStreet', 
             'Account__r.BillingCity', 
-            'Account__r.BillingState'
+            'Account__r.BillingState',
+            'Account__r.BillingPostalCode'
         ]]
+        .drop_duplicates(subset='Address ID')
         .rename(columns={
+            'Address ID': 'OBJECTID',
             'Account__r.BillingStreet': 'Address', 
             'Account__r.BillingCity': 'City', 
-            'Account__r.BillingState': 'Region'
+            'Account__r.BillingState': 'Region',
+            'Account__r.BillingPostalCode': 'Postal'
         })
-        .drop_duplicates()
-        # Getting an index column to link different objects before and after request is made
         .reset_index(drop=True)
-        .reset_index()
-        .rename(columns={
-            'index': 'OBJECTID'
-        })
     )
     
     # Finalizing dataframe attributes
@@ -103,6 +116,7 @@ def format_data(all_data: pd.DataFrame) -> list:
         {'attributes': val} 
             for val in list(
                 reduced_and_relabeled
+                .drop(columns=['Postal'])
                 # Only including certain characters in addresses (removing most special characters)
                 .assign(Address=reduced_and_relabeled.Address.apply(lambda address: re.sub(r"[^a-zA-Z0-9. ]", "", address)))
                 .T
@@ -110,7 +124,7 @@ def format_data(all_data: pd.DataFrame) -> list:
                 .values()
     )]
 
-    return reduced_and_relabeled, spatial_data
+    return all_data, reduced_and_relabeled, spatial_data
 
 
 def chunks(l, n):
@@ -128,16 +142,20 @@ def chunks(l, n):
     return [{'records': l[i:i+n]} for i in range(0, len(l), n)]
 
 
-# Getting geospatial data
-reduced_df, spatial_data = format_data(all_data)
-
-# Geocoding addresses in batches of 100 (limit by URI length)
-spatial_data_chunks = chunks(spatial_data, 100)
+def geocode_locally(reduced_df: pd.DataFrame, spatial_data: list, address_index: dict) -> tuple:
+    """
+    Resolves the addresses of `reduced_df` (from `format_data`) against the local address index.
+    Returns the local locations and the `spatial_data` records that are left for ArcGIS.
+    """
+    local_locations, unresolved_df = local_geocoder.geocode_addresses(reduced_df, address_index)
+    unresolved_ids = set(unresolved_df['OBJECTID'])
+    return local_locations, [record for record in spatial_data if record['attributes']['OBJECTID'] in unresolved_ids]
 
 
-def generate_spatial_data(df_chunks, to_json=False):
+def generate_spatial_data(df_chunks, to_json=False, resolved=None):
     """
     Adds spatial data information to the `all_data` dataframe generated from earlier.
+    Locations already `resolved` (e.g. by the local geocoder) are combined with the ArcGIS results.
     """
     def check_error(data):
         """
@@ -155,23 +173,25 @@ def generate_spatial_data(df_chunks, to_json=False):
         
         return False
     
-    # Getting credentials
-    credentials = get_credentials('../credentials/arcgis_credentials.txt')
+    # Getting credentials (only needed if anything is left to geocode)
+    if df_chunks:
+        credentials = get_credentials('../credentials/arcgis_credentials.txt')
     
     # Making requests and appending locations to overall location list
-    all_locations = []
+    all_locations = list(resolved or [])
     for chunk_idx in range(len(df_chunks)):
         start = time.time()
         print("Currently on chunk:", chunk_idx)
-        res = requests.get("https://geocode.arcgis.com/arcgis/rest/services/World/GeocodeServer/geocodeAddresses?addresses={}&token={}&f=pjson".format(spatial_data_chunks[chunk_idx], credentials['access_token']))
+        res = requests.get("https://geocode.arcgis.com/arcgis/rest/services/World/GeocodeServer/geocodeAddresses?addresses={}&token={}&f=pjson".format(df_chunks[chunk_idx], credentials['access_token']))
         data = res.json()
         
         # Check if the data has an error
         if check_error(data):
             # Trying to make request again with new access token if there is an error
-            return generate_spatial_data(df_chunks, to_json)
+            return generate_spatial_data(df_chunks, to_json, resolved)
             
         all_locations.extend(data['locations'])
+        instrumentation.record_metric('chunks', chunk_idx + 1)
         finish = time.time()
         print("Request finished. Chunk took", finish - start, 'seconds.')
         
@@ -185,42 +205,33 @@ def generate_spatial_data(df_chunks, to_json=False):
     return all_locations
 
 
-# Getting location data
-locations = generate_spatial_data(spatial_data_chunks, to_json=True)
-
-
 def add_loc_data(reduced_df, all_data, to_csv=False):
     """
     Adds location data generated by `generate_spatial_data` to the `all_data` dataframe in a new `final_df`.
+    `all_data` must carry the `Address ID` column assigned by `format_data`.
     """
     # Load in the data
     file = open('../data/arcgis_latlong_data.json')
     data = json.load(file)
     
-    # Creating a mapping between 'OBJECTID' and 'Latitude' and 'Longitude' coordinates.
-    temp_mapping = {}
-    for obj in data:
-        object_id, status = obj['attributes']['ResultID'], obj['attributes']['Status']
-        temp_mapping[object_id] = obj['location'] if status != 'U' else {'x': np.nan, 'y': np.nan}
-
-    # Sorting the keys by ID so inserting into the dataframe will be easy.
-    coords_mapping = dict(sorted(temp_mapping.items()))
-    
-    # Creating location mapping dataframe
-    loc_mapping = reduced_df.copy(deep=True)
-    loc_mapping['Latitude'] = [coord['y'] for coord in list(coords_mapping.values())]
-    loc_mapping['Longitude'] = [coord['x'] for coord in list(coords_mapping.values())]
-    loc_mapping['Full Address'] = loc_mapping['Address'] + ',' + loc_mapping['City'] + ',' + loc_mapping['Region']
-    loc_mapping = loc_mapping[['Full Address', 'Latitude', 'Longitude']]
+    # Creating coordinate arrays indexed by 'ResultID' (the `Address ID` sent as 'OBJECTID').
+    # Addresses with no result or an unmatched ('U') result stay NaN.
+    result_ids = np.array([obj['attributes']['ResultID'] for obj in data], dtype='int64')
+    matched = np.array([obj['attributes']['Status'] != 'U' for obj in data], dtype=bool)
+    latitudes = np.full(len(reduced_df), np.nan)
+    longitudes = np.full(len(reduced_df), np.nan)
+    if matched.any():
+        latitudes[result_ids[matched]] = [obj['location']['y'] for obj, m in zip(data, matched) if m]
+        longitudes[result_ids[matched]] = [obj['location']['x'] for obj, m in zip(data, matched) if m]
     
-    # Creating `full_data` dataframe with `Full Address` w/o NaN values
-    full_data = all_data.copy(deep=True)
-    full_data['Full Address'] = full_data['Account__r.BillingStreet'] + ',' + full_data['Account__r.BillingCity'] + ',' + full_data['Account__r.BillingState']
-    full_data = full_data[full_data['Full Address'].notnull()]
+    # Attaching coordinates to each row via its address key
+    full_data = all_data[all_data['Address ID'] >= 0].copy(deep=True)
+    address_ids = full_data['Address ID'].to_numpy()
+    full_data['Latitude'] = latitudes.take(address_ids)
+    full_data['Longitude'] = longitudes.take(address_ids)
     
-    # Merging data and removing NaN's in lat/long
-    full_spatial_data = full_data.merge(loc_mapping, how='inner', left_on='Full Address', right_on='Full Address')
-    final_df = full_spatial_data[full_spatial_data.Latitude.notnull() & full_spatial_data.Longitude.notnull()]
+    # Removing NaN's in lat/long
+    final_df = full_data[full_data.Latitude.notnull() & full_data.Longitude.notnull()]
     
     # Adding country column (just U.S. for now)
     final_df['Country'] = 'United States'
@@ -232,26 +243,11 @@ def add_loc_data(reduced_df, all_data, to_csv=False):
     return final_df
 
 
-# Generating final dataframe with location data (lat, long) attached to each awarded opportunity.
-final = add_loc_data(reduced_df, all_data, to_csv=True)
-
-
 # ---
 
 # ## **Adding a category column instead of separate `DBE`, `MBE`, and `WBE` columns (to overlay plots at the same time on Carto).**
 
 
-# Read in data
-arcgis_df = pd.read_csv('../data/data_with_latlong.csv')
-
-
-# Join columns together
-arcgis_df['Category'] = arcgis_df[['DBE__c', 'MBE__c', 'WBE__c']].apply(
-    lambda x: ','.join(x.dropna().astype(str)),
-    axis=1
-)
-
-
 def find_category_name(booleans):
     """
     Find the category name for the list of booleans.
@@ -275,10 +271,72 @@ def find_category_name(booleans):
         return 'Not DBE, MBE, WBE'
     
 
-# Find category name for each row
-arcgis_df['Category'] = arcgis_df['Category'].apply(find_category_name)
+def add_category_column(arcgis_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds a `Category` column naming the combination of DBE, MBE, and WBE flags for each row.
+    """
+    arcgis_df = arcgis_df.copy()
+
+    # Join columns together
+    arcgis_df['Category'] = arcgis_df[['DBE__c', 'MBE__c', 'WBE__c']].apply(
+        lambda x: ','.join(x.dropna().astype(str)),
+        axis=1
+    )
+
+    # Find category name for each row
+    arcgis_df['Category'] = arcgis_df['Category'].apply(find_category_name)
+    return arcgis_df
+
+
+def main(all_data: pd.DataFrame = None):
+    instrumentation.start_run('additional_naics_data_processing')
+
+    # Read in generated data from previous notebook unless passed in
+    with instrumentation.stage('read_all_data') as stage:
+        if all_data is None:
+            all_data = artifacts.read_artifact('all_data')
+        stage['rows_out'] = len(all_data)
+
+    # Getting geospatial data
+    with instrumentation.stage('format_data', rows_in=len(all_data)) as stage:
+        all_data, reduced_df, spatial_data = format_data(all_data)
+        stage['rows_out'] = len(reduced_df)
+
+    # Resolving addresses against the local county address points index first
+    with instrumentation.stage('local_geocode', rows_in=len(reduced_df)) as stage, instrumentation.profiled('local_geocode'):
+        address_index = local_geocoder.load_address_index()
+        local_locations, spatial_data = geocode_locally(reduced_df, spatial_data, address_index)
+        stage['rows_out'] = len(local_locations)
+
+    # Geocoding the remaining addresses with ArcGIS in batches of 100 (limit by URI length)
+    spatial_data_chunks = chunks(spatial_data, 100)
+
+    # Getting location data
+    with instrumentation.stage('arcgis_geocode', rows_in=len(spatial_data)) as stage:
+        locations = generate_spatial_data(spatial_data_chunks, to_json=True, resolved=local_locations)
+        stage['rows_out'] = len(locations) - len(local_locations)
+
+    # Generating final dataframe with location data (lat, long) attached to each awarded opportunity.
+    with instrumentation.stage('add_loc_data', rows_in=len(all_data)) as stage:
+        final = add_loc_data(reduced_df, all_data, to_csv=True)
+        artifacts.write_artifact(final, 'data_with_latlong')
+        stage['rows_out'] = len(final)
+
+    # Adding a category column (to overlay plots at the same time on Carto)
+    with instrumentation.stage('add_category_column', rows_in=len(final)) as stage:
+        arcgis_df = add_category_column(artifacts.read_artifact('data_with_latlong'))
+        stage['rows_out'] = len(arcgis_df)
+
+    # Export dataframe
+    with instrumentation.stage('export', rows_in=len(arcgis_df)):
+        artifacts.write_artifact(arcgis_df, 'data_with_latlong_and_cat')
+        arcgis_df.to_csv('../data/data_with_latlong_and_cat.csv', index=False)
+
+        # Export the map layer (Hilbert-sorted GeoParquet + vector tiles aggregated by `Category`)
+        map_export.export_map_layer(arcgis_df)
 
+    instrumentation.write_report()
 
-# Export dataframe
-arcgis_df.to_csv('../data/data_with_latlong_and_cat.csv', index=False)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Intermediate datasets handed between the pipeline scripts
+ARTIFACT_DIR = '../data/artifacts'
+
+AWARD_FIELDS = [
+    pa.field('Account__r.BillingStreet', pa.string()),
+    pa.field('Account__r.BillingPostalCode', pa.string()),
+    pa.field('Account__r.BillingCity', pa.string()),
+    pa.field('Account__r.BillingState', pa.string()),
+    pa.field('Account__r.Name', pa.string()),
+    pa.field('vendor_id', pa.string()),
+    pa.field('Award_Amount__c', pa.float64()),
+    pa.field('Contract_Award_ID__c', pa.string()),
+    pa.field('DBE__c', pa.bool_()),
+    pa.field('MBE__c', pa.bool_()),
+    pa.field('WBE__c', pa.bool_()),
+    pa.field('Opportunity__r.Id', pa.string()),
+    pa.field('Opportunity__r.Name', pa.string()),
+    pa.field('Opportunity__r.Account.Name', pa.string()),
+    pa.field('Opportunity__r.Category__c', pa.string()),
+    pa.field('Opportunity__r.Bid_Due__c', pa.timestamp('ms', tz='UTC')),
+    pa.field('Opportunity__r.Bid_Post__c', pa.timestamp('ms', tz='UTC')),
+    pa.field('bid_due_year_month', pa.string()),
+]
+NAICS_FIELDS = [
+    pa.field('Opportunity_NAICS', pa.string()),
+    pa.field('NAICS_Code__r.NAICS_Description__c', pa.string()),
+]
+LOCATION_FIELDS = [
+    pa.field('Address ID', pa.int64()),
+    pa.field('Latitude', pa.float64()),
+    pa.field('Longitude', pa.float64()),
+    pa.field('Country', pa.string()),
+]
+
+# Partition columns (hive-style directories, e.g. `bid_due_year=2021/Opportunity_NAICS_2=33/`)
+BID_YEAR = pa.field('bid_due_year', pa.int16())
+NAICS_2 = pa.field('Opportunity_NAICS_2', pa.string())
+
+ARTIFACTS = {
+    # Award x NAICS rows from `naics_code_data_generation.py`
+    'all_naics_data': {
+        'schema': pa.schema(AWARD_FIELDS + NAICS_FIELDS + [BID_YEAR, NAICS_2]),
+        'partitioning': pa.schema([BID_YEAR, NAICS_2]),
+    },
+    # NAICS_Opportunity records (needed for the opportunity counts in `create_final_df`)
+    'opp_naics': {
+        'schema': pa.schema([
+            pa.field('Opportunity__r.Id', pa.string()),
+            pa.field('Opportunity__r.Account.Name', pa.string()),
+            pa.field('NAICS_Code__r.Name', pa.string()),
+            pa.field('NAICS_Code__r.NAICS_Description__c', pa.string()),
+            pa.field('Opportunity__r.Category__c', pa.string()),
+            pa.field('Opportunity__r.Bid_Due__c', pa.timestamp('ms', tz='UTC')),
+            pa.field('Opportunity__r.Bid_Post__c', pa.timestamp('ms', tz='UTC')),
+            BID_YEAR,
+        ]),
+        'partitioning': pa.schema([BID_YEAR]),
+    },
+    # One row per award (NAICS columns dropped)
+    'all_data': {
+        'schema': pa.schema(AWARD_FIELDS + [BID_YEAR]),
+        'partitioning': pa.schema([BID_YEAR]),
+    },
+    # Awards with lat/long from `additional_naics_data_processing.py`
+    'data_with_latlong': {
+        'schema': pa.schema(AWARD_FIELDS + LOCATION_FIELDS + [BID_YEAR]),
+        'partitioning': pa.schema([BID_YEAR]),
+    },
+    'data_with_latlong_and_cat': {
+        'schema': pa.schema(AWARD_FIELDS + LOCATION_FIELDS + [pa.field('Category', pa.string()), BID_YEAR]),
+        'partitioning': pa.schema([BID_YEAR]),
+    },
+}
+
+
+def get_artifact_path(name: str, artifact_dir: str = ARTIFACT_DIR) -> str:
+    """
+    Returns the directory holding the named artifact's parquet dataset.
+    """
+    return os.path.join(artifact_dir, name)
+
+
+def add_partition_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Derives the bid year (and bid year-month) from `Opportunity__r.Bid_Due__c` and the
+    2-digit NAICS sector from `Opportunity_NAICS` where present.
+    """
+    bid_due = pd.to_datetime(df['Opportunity__r.Bid_Due__c'], utc=True)
+    df = df.assign(
+        bid_due_year=bid_due.dt.year,
+        bid_due_year_month=bid_due.dt.strftime('%Y-%m'),
+    )
+    if 'Opportunity_NAICS' in df.columns:
+        df['Opportunity_NAICS_2'] = df['Opportunity_NAICS'].astype(str).str[:2]
+    return df
+
+
+def coerce_to_schema(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """
+    Casts the columns of `df` to the explicit artifact schema (dropping any extra columns) instead of
+    relying on type inference.
+    """
+    columns = {}
+    for field in schema:
+        col = df[field.name]
+        if pa.types.is_string(field.type):
+            col = col.astype(str).where(col.notnull(), None)
+        elif pa.types.is_boolean(field.type):
+            col = col.astype('boolean')
+        elif pa.types.is_floating(field.type):
+            col = pd.to_numeric(col, errors='coerce')
+        elif pa.types.is_integer(field.type):
+            col = pd.to_numeric(col, errors='coerce').astype('Int64')
+        elif pa.types.is_timestamp(field.type):
+            col = pd.to_datetime(col, utc=True)
+        columns[field.name] = col
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+
+
+def write_artifact(df: pd.DataFrame, name: str, artifact_dir: str = ARTIFACT_DIR) -> None:
+    """
+    Writes `df` as the named artifact: a zstd-compressed parquet dataset with an explicit schema,
+    partitioned by bid year (and NAICS-2 where available). Replaces any previous version.
+    """
+    spec = ARTIFACTS[name]
+    path = get_artifact_path(name, artifact_dir)
+    table = coerce_to_schema(add_partition_columns(df), spec['schema'])
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    ds.write_dataset(
+        table,
+        path,
+        format='parquet',
+        partitioning=ds.partitioning(spec['partitioning'], flavor='hive'),
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+    )
+
+
+def read_artifact_table(name: str, columns: list = None, filters=None, artifact_dir: str = ARTIFACT_DIR) -> pa.Table:
+    """
+    Reads the named artifact as an Arrow table. Only `columns` are read, and `filters`
+    (e.g. `[('bid_due_year', '=', 2021)]`) are pushed down so non-matching partitions are skipped.
+    """
+    spec = ARTIFACTS[name]
+    return pq.read_table(
+        get_artifact_path(name, artifact_dir),
+        columns=columns,
+        filters=filters,
+        schema=spec['schema'],
+        partitioning=ds.partitioning(spec['partitioning'], flavor='hive'),
+    )
+
+
+def read_artifact(name: str, columns: list = None, filters=None, artifact_dir: str = ARTIFACT_DIR) -> pd.DataFrame:
+    """
+    Reads the named artifact into a dataframe (see `read_artifact_table`).
+    """
+    return read_artifact_table(name, columns, filters, artifact_dir).to_pandas()
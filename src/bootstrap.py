@@ -0,0 +1,105 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Bootstrap defaults: number of resamples, resamples per chunk (one chunk per task), seed and CI level
+N_RESAMPLES = 10000
+CHUNK_SIZE = 50
+SEED = 0
+ALPHA = 0.05
+
+# Sorted amounts, flags, group starts and sizes of the current run, sent once to each worker
+WORKER_DATA = None
+
+
+def bootstrap_chunk(amounts: np.ndarray, flags: np.ndarray, starts: np.ndarray, sizes: np.ndarray,
+                    seed: np.random.SeedSequence, n_resamples: int) -> np.ndarray:
+    """
+    Runs `n_resamples` bootstrap resamples of every group at once. Rows must be sorted by group;
+    group g occupies rows starts[g]:starts[g] + sizes[g].
+
+    Each row's draw is taken uniformly from its own group, so every group is resampled with replacement
+    to its own size (segment-wise multinomial weights) in a single (n_resamples x rows) draw.
+    Returns a float32 array of shape (2 * n_flags, n_resamples, n_groups): the % of dollars and then the
+    % of contracts for each flag column.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows, n_flags = flags.shape
+    row_start = np.repeat(starts, sizes)
+    row_size = np.repeat(sizes, sizes)
+    idx = row_start + (rng.random((n_resamples, n_rows)) * row_size).astype(np.int64)
+
+    resampled_amounts = amounts[idx]
+    total_dollars = np.add.reduceat(resampled_amounts, starts, axis=1)
+    shares = np.empty((2 * n_flags, n_resamples, len(starts)), dtype=np.float32)
+    for k in range(n_flags):
+        resampled_flags = flags[:, k][idx]
+        flag_dollars = np.add.reduceat(resampled_amounts * resampled_flags, starts, axis=1)
+        shares[k] = 100 * np.divide(
+            flag_dollars, total_dollars,
+            out=np.full(total_dollars.shape, np.nan), where=total_dollars != 0
+        )
+        shares[n_flags + k] = 100 * np.add.reduceat(resampled_flags, starts, axis=1) / sizes
+    return shares
+
+
+def init_worker(amounts: np.ndarray, flags: np.ndarray, starts: np.ndarray, sizes: np.ndarray) -> None:
+    global WORKER_DATA
+    WORKER_DATA = (amounts, flags, starts, sizes)
+
+
+def run_chunk(seed: np.random.SeedSequence, n_resamples: int) -> np.ndarray:
+    """
+    Runs `bootstrap_chunk` on the data the worker was initialized with.
+    """
+    return bootstrap_chunk(*WORKER_DATA, seed, n_resamples)
+
+
+def bootstrap_shares(groups: pd.Series, amounts: pd.Series, flags: pd.DataFrame, n_resamples: int = N_RESAMPLES,
+                     chunk_size: int = CHUNK_SIZE, seed: int = SEED, alpha: float = ALPHA, max_workers: int = None) -> pd.DataFrame:
+    """
+    Bootstraps the % of dollars and % of contracts awarded to each flag column (e.g. DBE__c) for every group.
+    Resamples are split into chunks that run across cores; each chunk gets its own child of the seed,
+    so results don't depend on the number of workers. The data is sent to each worker once, not per chunk.
+    Returns a dataframe indexed by group with `<flag> dollars low/high` and `<flag> contracts low/high` columns
+    holding the (alpha/2, 1 - alpha/2) percentile interval in percent. Rows without a group are left out.
+    """
+    codes, uniques = pd.factorize(groups, sort=True)
+    columns = [
+        '{} {} {}'.format(flag, measure, bound)
+        for flag in flags.columns for measure in ['dollars', 'contracts'] for bound in ['low', 'high']
+    ]
+    if len(uniques) == 0:
+        return pd.DataFrame(columns=columns, index=pd.Index(uniques, name=groups.name), dtype=np.float64)
+
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    sizes = np.bincount(codes[order], minlength=len(uniques))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    amounts = amounts.fillna(0).to_numpy(dtype=np.float64)[order]
+    flag_values = flags.fillna(False).to_numpy(dtype=np.float64)[order]
+
+    # Splitting the resamples into chunks with independent random streams
+    chunk_sizes = [min(chunk_size, n_resamples - i) for i in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    n_flags = flag_values.shape[1]
+    shares = np.empty((2 * n_flags, n_resamples, len(uniques)), dtype=np.float32)
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=init_worker,
+                             initargs=(amounts, flag_values, starts, sizes)) as pool:
+        chunks = pool.map(run_chunk, seeds, chunk_sizes)
+        offset = 0
+        for n, chunk in zip(chunk_sizes, chunks):
+            shares[:, offset:offset + n] = chunk
+            offset += n
+
+    low, high = np.nanquantile(shares, [alpha / 2, 1 - alpha / 2], axis=1)
+    intervals = {}
+    for k, flag in enumerate(flags.columns):
+        intervals['{} dollars low'.format(flag)] = low[k]
+        intervals['{} dollars high'.format(flag)] = high[k]
+        intervals['{} contracts low'.format(flag)] = low[n_flags + k]
+        intervals['{} contracts high'.format(flag)] = high[n_flags + k]
+    return pd.DataFrame(intervals, index=pd.Index(uniques, name=groups.name))[columns]
@@ -0,0 +1,117 @@
+"""
+Command line entry point for the procurement pipeline (`procurement --help`).
+
+Each subcommand imports its stage module only when it runs, so `--help` and single-stage runs
+don't pay for the other stages' dependencies. Data paths are relative to the working directory
+(`../data/...`), so run it from `src/` or pass `--workdir`.
+"""
+import os
+import argparse
+
+CERTIFIED_COUNTS_HELP = (
+    'CSV or parquet of certified firm counts (NAICS, region, firms, DBE, MBE, WBE) used as availability; '
+    'without it availability and the disparity index are empty.'
+)
+
+
+def run_generate(args):
+    import naics_code_data_generation
+    naics_code_data_generation.main(confidence_intervals=args.confidence_intervals)
+
+
+def run_geocode(args):
+    import additional_naics_data_processing
+    additional_naics_data_processing.main()
+
+
+def run_geography(args):
+    import geography
+    geography.main()
+
+
+def run_temporal(args):
+    import temporal
+    temporal.main(years=args.year)
+
+
+def run_disparity(args):
+    import disparity
+    disparity.main(certified_counts=args.certified_counts)
+
+
+def run_award_quantiles(args):
+    import sketches
+    sketches.main()
+
+
+def run_analyze(args):
+    import scheduler
+    scheduler.run_branches(args.branch, args.workers, options={
+        'disparity': {'certified_counts': args.certified_counts},
+    })
+
+
+def run_serve(args):
+    import uvicorn
+    import read_api
+    uvicorn.run(read_api.app, host=args.host, port=args.port)
+
+
+def run_build_address_index(args):
+    import local_geocoder
+    local_geocoder.build_address_index(args.source)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='procurement', description='Equity procurement analysis pipeline.')
+    parser.add_argument('--workdir', default=None, help='Directory to run from (data is read/written in ../data).')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help='Pull Salesforce awards/NAICS data and build the NAICS analysis sheet.')
+    generate.add_argument('--confidence-intervals', action='store_true', help='Append bootstrapped 95%% intervals of the DBE/MBE/WBE shares.')
+    generate.set_defaults(func=run_generate)
+
+    geocode = subparsers.add_parser('geocode', help='Geocode award addresses and export the map layer.')
+    geocode.set_defaults(func=run_geocode)
+
+    geography = subparsers.add_parser('geography', help='Break down businesses and awards by location.')
+    geography.set_defaults(func=run_geography)
+
+    temporal = subparsers.add_parser('temporal', help='DBE/MBE/WBE percentages by bid year and month.')
+    temporal.add_argument('--year', type=int, action='append', help='Only analyze this bid year (repeatable); writes separate files and skips the Google Sheet.')
+    temporal.set_defaults(func=run_temporal)
+
+    disparity = subparsers.add_parser('disparity', help='Disparity index (utilization / availability) by NAICS level, region, group and fiscal year.')
+    disparity.add_argument('--certified-counts', default=None, help=CERTIFIED_COUNTS_HELP)
+    disparity.set_defaults(func=run_disparity)
+
+    award_quantiles = subparsers.add_parser('award-quantiles', help='Median and p90 award amounts by NAICS code, category and period.')
+    award_quantiles.set_defaults(func=run_award_quantiles)
+
+    analyze = subparsers.add_parser('analyze', help='Run the NAICS, temporal, geocoding, geography, disparity and award quantile branches in parallel.')
+    analyze.add_argument('--branch', action='append', help='Only run this branch (repeatable); see scheduler.BRANCHES.')
+    analyze.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: one per branch).')
+    analyze.add_argument('--certified-counts', default=None, help=CERTIFIED_COUNTS_HELP)
+    analyze.set_defaults(func=run_analyze)
+
+    serve = subparsers.add_parser('serve', help='Serve the NAICS, temporal, geography and disparity tables over a local HTTP API.')
+    serve.add_argument('--host', default='127.0.0.1', help='Interface to listen on.')
+    serve.add_argument('--port', type=int, default=8000, help='Port to listen on.')
+    serve.set_defaults(func=run_serve)
+
+    address_index = subparsers.add_parser('build-address-index', help='Build the local geocoding index from the county address points file.')
+    address_index.add_argument('--source', default='../data/address_points.csv', help='County address points CSV.')
+    address_index.set_defaults(func=run_build_address_index)
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.workdir:
+        os.chdir(args.workdir)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+
+import artifacts
+import instrumentation
+
+# Disparity grid dimensions
+NAICS_LEVELS = [2, 3, 4, 5, 6]
+REGIONS = ['city', 'county', 'other']
+GROUP_COLUMNS = ['DBE__c', 'MBE__c', 'WBE__c']
+GROUPS = ['DBE', 'MBE', 'WBE']
+
+# The City's fiscal year starts July 1st and is named after the year it ends in
+FISCAL_YEAR_START_MONTH = 7
+
+# Non-empty cells of the grid (one row per NAICS code x region x group x fiscal year)
+DISPARITY_FILE = '../data/disparity_index.parquet'
+
+# Certified firm counts (the availability source): one row per 6-digit NAICS code and region
+CERTIFIED_COLUMNS = ['NAICS', 'region', 'firms'] + GROUPS
+
+AWARD_COLUMNS = [
+    'Contract_Award_ID__c',
+    'Opportunity__r.Id',
+    'Account__r.Name',
+    'vendor_id',
+    'Account__r.BillingPostalCode',
+    'Account__r.BillingCity',
+    'Award_Amount__c',
+    'Opportunity__r.Bid_Due__c',
+    'Opportunity_NAICS',
+] + GROUP_COLUMNS
+
+
+def get_fiscal_years(bid_due: pd.Series) -> pd.Series:
+    """
+    Returns the fiscal year of each bid due date (e.g. 2020-08-01 falls in FY 2021).
+    """
+    bid_due = pd.to_datetime(bid_due, utc=True)
+    return bid_due.dt.year + (bid_due.dt.month >= FISCAL_YEAR_START_MONTH)
+
+
+def assign_regions(zip5: pd.Series, city: pd.Series, city_zips, county_zips, county_names) -> np.ndarray:
+    """
+    Returns the index into REGIONS of each address, using the same rules as `geography.separate_businesses`.
+    """
+    city = city.fillna('').astype(str).str.strip().str.lower().str.replace(' ', '', regex=False)
+    zip5 = zip5.fillna('').astype(str).str[:5]
+    in_city = (zip5.isin(city_zips) & ~city.isin(county_names)) | (city == 'losangeles')
+    in_county = (zip5.isin(county_zips) | city.isin(county_names)) & (city != 'losangeles')
+    return np.select([in_city.to_numpy(), in_county.to_numpy()], [0, 1], default=2)
+
+
+def prepare_awards(awards: pd.DataFrame, zip_lists) -> tuple:
+    """
+    Encodes the award x NAICS rows once so the grid can be recomputed quickly: integer award, vendor,
+    region and fiscal year codes plus the award amount and DBE/MBE/WBE flags.
+    Rows without a bid due date are dropped. Returns the encoded dataframe and the fiscal years.
+    """
+    city_zips, county_zips, county_names = zip_lists
+    fiscal_years = get_fiscal_years(awards['Opportunity__r.Bid_Due__c'])
+    awards = awards[fiscal_years.notnull()]
+    year_codes, years = pd.factorize(fiscal_years[fiscal_years.notnull()].astype(int), sort=True)
+
+    # Counting resolved vendors where available (see `vendor_resolution.py`)
+    vendors = awards['Account__r.Name']
+    if 'vendor_id' in awards.columns:
+        vendors = awards['vendor_id'].fillna(vendors)
+
+    prepared = pd.DataFrame({
+        'award': awards.groupby(['Contract_Award_ID__c', 'Opportunity__r.Id'], sort=False, dropna=False).ngroup().to_numpy(),
+        'vendor': pd.factorize(vendors)[0],
+        'region': assign_regions(
+            awards['Account__r.BillingPostalCode'], awards['Account__r.BillingCity'],
+            city_zips, county_zips, county_names
+        ),
+        'year': year_codes,
+        'naics': awards['Opportunity_NAICS'].astype(str).to_numpy(),
+        'amount': pd.to_numeric(awards['Award_Amount__c'], errors='coerce').fillna(0).to_numpy(),
+    })
+    for column in GROUP_COLUMNS:
+        prepared[column] = awards[column].fillna(False).to_numpy(dtype=np.float64)
+    return prepared, np.asarray(years)
+
+
+def read_certified_counts(path: str) -> pd.DataFrame:
+    """
+    Reads the certified firm counts from a CSV or parquet file with the CERTIFIED_COLUMNS
+    (`region` one of REGIONS). Raises ValueError if columns are missing.
+    """
+    if path.endswith('.parquet'):
+        counts = pd.read_parquet(path)
+    else:
+        counts = pd.read_csv(path, dtype={'NAICS': str})
+    missing = [c for c in CERTIFIED_COLUMNS if c not in counts.columns]
+    if missing:
+        raise ValueError('{} is missing columns: {}'.format(path, ', '.join(missing)))
+    return counts.assign(NAICS=counts['NAICS'].astype(str))
+
+
+def compute_level(prepared: pd.DataFrame, n_years: int, business_counts, level: int, certified_counts: pd.DataFrame = None) -> dict:
+    """
+    Computes the dense (NAICS code x region x group x fiscal year) arrays for one NAICS level.
+    The last region is the total over all regions.
+
+    Utilization is the share of award dollars that went to the group. Availability is the share of
+    the certified firms in the market that are group members; without `certified_counts` (and in
+    cells without certified firms) it is NaN, and so is the disparity index. The awarded-vendor proxy
+    is always computed under its own name: `vendor_share` (group members among the distinct awarded
+    vendors) and `vendor_disparity_index`. Shares have no fiscal year axis and are broadcast across
+    years. The business listing is only reported, as `registry_firms`, since it has no group membership.
+    """
+    # Shared NAICS axis for the awards, the business listing and the certified firm counts
+    sources = [counts['NAICS'] for counts in business_counts]
+    if certified_counts is not None:
+        sources.append(certified_counts['NAICS'])
+    naics = pd.concat(
+        [prepared['naics'].str[:level]] + [source.astype(str).str[:level] for source in sources],
+        ignore_index=True
+    )
+    codes, uniques = pd.factorize(naics, sort=True)
+    award_codes = codes[:len(prepared)]
+    C, R, G, Y = len(uniques), len(REGIONS), len(GROUP_COLUMNS), n_years
+
+    # An award listed under several NAICS codes is counted once per code at this level
+    _, first = np.unique(prepared['award'].to_numpy() * C + award_codes, return_index=True)
+    region = prepared['region'].to_numpy()[first]
+    year = prepared['year'].to_numpy()[first]
+    amount = prepared['amount'].to_numpy()[first]
+    flags = prepared[GROUP_COLUMNS].to_numpy()[first]
+    code = award_codes[first]
+
+    # Award dollars and counts per cell, with a single bincount per array
+    cell = (code * R + region) * Y + year
+    dollars = np.bincount(cell, weights=amount, minlength=C * R * Y).reshape(C, R, Y)
+    awards = np.bincount(cell, minlength=C * R * Y).reshape(C, R, Y)
+    group_cell = ((code * R + region)[:, None] * G + np.arange(G)) * Y + year[:, None]
+    group_dollars = np.bincount(
+        group_cell.ravel(), weights=(amount[:, None] * flags).ravel(), minlength=C * R * G * Y
+    ).reshape(C, R, G, Y)
+
+    # Distinct vendors (and group members among them) per NAICS code and region
+    named = prepared['vendor'].to_numpy() >= 0
+    vendor_cell, vendor_index = np.unique(
+        (prepared['vendor'].to_numpy() * (C * R) + award_codes * R + prepared['region'].to_numpy())[named],
+        return_inverse=True
+    )
+    vendor_flags = np.zeros((len(vendor_cell), G))
+    np.maximum.at(vendor_flags, vendor_index, prepared[GROUP_COLUMNS].to_numpy()[named])
+    vendor_cell = vendor_cell % (C * R)
+    vendors = np.bincount(vendor_cell, minlength=C * R).reshape(C, R)
+    group_vendors = np.bincount(
+        (vendor_cell[:, None] * G + np.arange(G)).ravel(), weights=vendor_flags.ravel(), minlength=C * R * G
+    ).reshape(C, R, G)
+
+    # Firms in the business listing per NAICS code and region
+    registry_firms = np.zeros((C, R))
+    offset = len(prepared)
+    for r, counts in enumerate(business_counts):
+        registry_firms[:, r] = np.bincount(
+            codes[offset:offset + len(counts)], weights=counts.iloc[:, 1].to_numpy(), minlength=C
+        )
+        offset += len(counts)
+
+    # Certified firms (and group members among them) per NAICS code and region, NaN if not given
+    if certified_counts is not None:
+        certified_region = pd.Index(REGIONS).get_indexer(certified_counts['region'])
+        known = certified_region >= 0
+        certified_cell = codes[offset:] * R + certified_region
+        certified_firms = np.bincount(
+            certified_cell[known], weights=certified_counts['firms'].to_numpy(dtype=np.float64)[known], minlength=C * R
+        ).reshape(C, R)
+        group_certified_firms = np.stack([
+            np.bincount(certified_cell[known], weights=certified_counts[group].to_numpy(dtype=np.float64)[known], minlength=C * R)
+            for group in GROUPS
+        ], axis=-1).reshape(C, R, G)
+    else:
+        certified_firms = np.full((C, R), np.nan)
+        group_certified_firms = np.full((C, R, G), np.nan)
+
+    # Appending the all-region totals
+    dollars, awards, group_dollars, vendors, group_vendors, certified_firms, group_certified_firms, registry_firms = [
+        np.concatenate([a, a.sum(axis=1, keepdims=True)], axis=1)
+        for a in [dollars, awards, group_dollars, vendors, group_vendors, certified_firms, group_certified_firms, registry_firms]
+    ]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilization = np.where(dollars[:, :, None, :] > 0, group_dollars / dollars[:, :, None, :], np.nan)
+        availability = np.where(certified_firms[:, :, None] > 0, group_certified_firms / certified_firms[:, :, None], np.nan)
+        disparity = np.where(availability[..., None] > 0, 100 * utilization / availability[..., None], np.nan)
+        vendor_share = np.where(vendors[:, :, None] > 0, group_vendors / vendors[:, :, None], np.nan)
+        vendor_disparity = np.where(vendor_share[..., None] > 0, 100 * utilization / vendor_share[..., None], np.nan)
+
+    return {
+        'naics': np.asarray(uniques),
+        'dollars': dollars,
+        'awards': awards,
+        'group_dollars': group_dollars,
+        'vendors': vendors,
+        'group_vendors': group_vendors,
+        'certified_firms': certified_firms,
+        'group_certified_firms': group_certified_firms,
+        'registry_firms': registry_firms,
+        'utilization': utilization,
+        'availability': availability,
+        'disparity_index': disparity,
+        'vendor_share': vendor_share,
+        'vendor_disparity_index': vendor_disparity,
+    }
+
+
+def grid_to_frame(grid: dict, level: int, years: np.ndarray) -> pd.DataFrame:
+    """
+    Stores the non-empty cells of a level's grid (cells with award dollars) in long format.
+    """
+    C, R, G, Y = grid['group_dollars'].shape
+    mask = np.broadcast_to(grid['dollars'][:, :, None, :] > 0, (C, R, G, Y))
+    c, r, g, y = np.nonzero(mask)
+    return pd.DataFrame({
+        'naics_level': np.full(len(c), level, dtype=np.int8),
+        'naics': grid['naics'][c],
+        'region': np.asarray(REGIONS + ['all'])[r],
+        'group': np.asarray(GROUPS)[g],
+        'fiscal_year': years[y].astype(np.int16),
+        'award_dollars': grid['dollars'][c, r, y],
+        'awards': grid['awards'][c, r, y],
+        'group_award_dollars': grid['group_dollars'][c, r, g, y],
+        'vendors': grid['vendors'][c, r],
+        'group_vendors': grid['group_vendors'][c, r, g],
+        'certified_firms': grid['certified_firms'][c, r],
+        'group_certified_firms': grid['group_certified_firms'][c, r, g],
+        'registry_firms': grid['registry_firms'][c, r],
+        'utilization': grid['utilization'][c, r, g, y],
+        'availability': grid['availability'][c, r, g],
+        'disparity_index': grid['disparity_index'][c, r, g, y],
+        'vendor_share': grid['vendor_share'][c, r, g],
+        'vendor_disparity_index': grid['vendor_disparity_index'][c, r, g, y],
+    })
+
+
+def compute_disparity(awards: pd.DataFrame, zip_lists, business_counts, levels: list = None,
+                      certified_counts: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Computes utilization, availability and the disparity index (100 x utilization / availability)
+    for every NAICS level x region x DBE/MBE/WBE x fiscal year with award dollars, plus the
+    awarded-vendor proxy (`vendor_share`, `vendor_disparity_index`).
+    `zip_lists` and `business_counts` are the outputs of `geography.get_business_counts`.
+    `certified_counts` (see `read_certified_counts`) gives the availability; without it availability
+    and the disparity index are NaN.
+    """
+    prepared, years = prepare_awards(awards, zip_lists)
+    return pd.concat([
+        grid_to_frame(compute_level(prepared, len(years), business_counts, level, certified_counts), level, years)
+        for level in (levels or NAICS_LEVELS)
+    ], ignore_index=True)
+
+
+def main(geography_businesses=None, certified_counts: str = None):
+    """
+    Computes the disparity table. `certified_counts` is the path of the certified firm counts.
+    """
+    instrumentation.start_run('disparity')
+
+    with instrumentation.stage('read_all_naics_data') as stage:
+        awards = artifacts.read_artifact('all_naics_data', columns=AWARD_COLUMNS)
+        stage['rows_out'] = len(awards)
+
+    if geography_businesses is None:
+        import geography
+        geography_businesses = geography.get_business_counts()
+    zip_lists, business_counts = geography_businesses
+
+    with instrumentation.stage('compute_disparity', rows_in=len(awards)) as stage, instrumentation.profiled('compute_disparity'):
+        disparity = compute_disparity(
+            awards, zip_lists, business_counts,
+            certified_counts=read_certified_counts(certified_counts) if certified_counts else None
+        )
+        stage['rows_out'] = len(disparity)
+
+    disparity.to_parquet(DISPARITY_FILE, index=False)
+    instrumentation.write_report()
+    return disparity
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
 import pandas as pd
 import numpy as np
-from sodapy import Socrata
 import save_files
+import artifacts
+import instrumentation
+import reference_data
 
-# set up Socrata client
-COUNTY_CLIENT = Socrata("data.lacounty.gov", None)
-CITY_CLIENT = Socrata("data.lacity.org", None)
 
 def get_zip_codes():
     """
@@ -15,10 +14,9 @@ def get_zip_codes():
     Returns a list of names for cities in LA County (excluding LA City)
     """
 
-    # Fetch information from the LA County data portal
+    # Fetch information from the LA County data portal (see `catalogs/catalog.yml`)
     # Headcount of cities in LA County with their corresponding zip codes
-    # !!make sure this is fetching all of them with no limit
-    zips = pd.DataFrame.from_records(COUNTY_CLIENT.get("c3xr-3jw2"))
+    zips = reference_data.get_reference_data('la_county_zip_codes')
 
     # preprocess: rename some columns
     zips.rename(columns={"zip_code": "ZIP5"}, inplace=True)
@@ -51,8 +49,8 @@ def get_all_business_data():
     Fetches a listing of registered active businesses from LA City Data Portal
     Returns a dataframe of all the businesses
     """
-    # fetch List of Active Businesses
-    all_biz = pd.DataFrame.from_records(CITY_CLIENT.get("6rrh-rzua"))
+    # fetch List of Active Businesses (see `catalogs/catalog.yml`)
+    all_biz = reference_data.get_reference_data('la_city_active_businesses')
 
     # preprocess: rename some columns
     all_biz.rename(columns={"street_address": "STREET",
@@ -104,7 +102,9 @@ def separate_businesses(all_biz: pd.DataFrame, city_zips, county_zips, county_na
     # other_biz = pd.concat([all_biz, city_biz, county_biz]).drop_duplicates(keep=False)
 
     # sanity check
-    print(all_biz.size - city_biz.size - county_biz.size - other_biz.size == 0)
+    residual = all_biz.size - city_biz.size - county_biz.size - other_biz.size
+    instrumentation.record_metric('sanity_residual', int(residual))
+    print(residual == 0)
     return city_biz, county_biz, other_biz
 
 
@@ -127,11 +127,18 @@ def get_business_naics_info(city_biz, county_biz, other_biz):
 
 
 
-def get_awards_by_location(city_zips, county_zips, county_names):
+def get_awards_by_location(city_zips, county_zips, county_names, awards=None):
     """
     Returns awards broken down by geographical location 
+    Reads the `all_data` artifact unless `awards` is passed in.
     """
-    awards = pd.read_csv('../data/all_data.csv')
+    if awards is None:
+        awards = artifacts.read_artifact('all_data', columns=[
+            'Account__r.BillingStreet',
+            'Account__r.BillingPostalCode',
+            'Account__r.BillingCity',
+            'Account__r.BillingState',
+        ])
 
     # preprocess: rename some columns
     awards.rename(columns={"Account__r.BillingStreet" : "STREET",
@@ -151,20 +158,22 @@ def get_awards_by_location(city_zips, county_zips, county_names):
     awards_out_of_state = awards.loc[(awards.STATE!='CA')]
 
     # sanity check
-    print(len(awards) - len(awards_in_city) - len(awards_in_county) - len(awards_in_state) - len(awards_out_of_state))
+    residual = len(awards) - len(awards_in_city) - len(awards_in_county) - len(awards_in_state) - len(awards_out_of_state)
+    instrumentation.record_metric('sanity_residual', int(residual))
+    print(residual)
 
     return awards_in_city, awards_in_county, awards_in_state, awards_out_of_state
 
 
 def count_awards_by_location(awards_in_city, awards_in_county, awards_in_state, awards_out_of_state):
     """
-    Returns a tally of how many awards in each region
+    Returns a tally of how many awards in each region (rows, whichever columns were read)
     """
     df = pd.DataFrame({
-        'awards_in_city': awards_in_city.size,
-        'awards_in_county': awards_in_county.size,
-        'awards_in_state': awards_in_state.size,
-        'awards_out_of_state': awards_out_of_state.size
+        'awards_in_city': len(awards_in_city),
+        'awards_in_county': len(awards_in_county),
+        'awards_in_state': len(awards_in_state),
+        'awards_out_of_state': len(awards_out_of_state)
     }, index=[0])
 
     return df
@@ -199,21 +208,64 @@ def main():
     # So the distribution by location is slightly off due to some instances of double-counting
     # See sanity checks throughout this code
 
-    city_zips, county_zips, county_names = get_zip_codes()
-    all_biz = get_all_business_data()
-    city_biz, county_biz, other_biz = separate_businesses(all_biz, city_zips, county_zips, county_names)
-    city_biz_counts, county_biz_counts, other_biz_counts = get_business_naics_info(city_biz, county_biz, other_biz)
+    instrumentation.start_run('geography')
+    zip_lists, business_counts = get_business_counts()
+    publish_geography(zip_lists, business_counts)
+    instrumentation.write_report()
 
-    awards_in_city, awards_in_county, awards_in_state, awards_out_of_state = get_awards_by_location(city_zips, county_zips, county_names)
+
+def get_business_counts():
+    """
+    Fetches zip codes and businesses from the data portals and counts businesses per NAICS code by region.
+    Returns the zip code lists and the (city, county, other) business counts.
+    """
+    with instrumentation.stage('get_zip_codes') as stage:
+        city_zips, county_zips, county_names = get_zip_codes()
+        stage['rows_out'] = len(city_zips) + len(county_zips)
+    with instrumentation.stage('get_all_business_data') as stage, instrumentation.profiled('get_all_business_data'):
+        all_biz = get_all_business_data()
+        stage['rows_out'] = len(all_biz)
+    with instrumentation.stage('separate_businesses', rows_in=len(all_biz)) as stage:
+        city_biz, county_biz, other_biz = separate_businesses(all_biz, city_zips, county_zips, county_names)
+        stage['rows_out'] = len(city_biz) + len(county_biz) + len(other_biz)
+    with instrumentation.stage('get_business_naics_info', rows_in=stage['rows_out']) as stage:
+        city_biz_counts, county_biz_counts, other_biz_counts = get_business_naics_info(city_biz, county_biz, other_biz)
+        stage['rows_out'] = len(city_biz_counts) + len(county_biz_counts) + len(other_biz_counts)
+
+    return (city_zips, county_zips, county_names), (city_biz_counts, county_biz_counts, other_biz_counts)
+
+
+def publish_geography(zip_lists, business_counts, awards=None):
+    """
+    Breaks awards down by location, compares opportunities with business counts and publishes both tabs.
+    """
+    city_zips, county_zips, county_names = zip_lists
+    city_biz_counts, county_biz_counts, other_biz_counts = business_counts
+
+    with instrumentation.stage('get_awards_by_location') as stage:
+        awards_in_city, awards_in_county, awards_in_state, awards_out_of_state = get_awards_by_location(city_zips, county_zips, county_names, awards)
+        stage['rows_out'] = len(awards_in_city) + len(awards_in_county) + len(awards_in_state) + len(awards_out_of_state)
     awards_by_location = count_awards_by_location(awards_in_city, awards_in_county, awards_in_state, awards_out_of_state)
 
-    opportunities_vs_businesses = count_opportunities_vs_businesses(city_biz_counts, county_biz_counts, other_biz_counts)
+    with instrumentation.stage('count_opportunities_vs_businesses') as stage:
+        opportunities_vs_businesses = count_opportunities_vs_businesses(city_biz_counts, county_biz_counts, other_biz_counts)
+        stage['rows_out'] = len(opportunities_vs_businesses)
+
+    # Cache parquet files for the read API
+    awards_by_location.to_parquet('../data/awards_by_location.parquet', index=False)
+    opportunities_vs_businesses.to_parquet('../data/opportunities_vs_businesses.parquet', index=False)
+
+    with instrumentation.stage('publish_gsheet'):
+        publisher = save_files.SheetPublisher("Procurement Data New")
+
+        # save awards by location to gsheet
+        publisher.update(awards_by_location, 6)
 
-    # save awards by location to gsheet
-    save_files.save_to_gsheet(awards_by_location, "Procurement Data New", 6)
+        # save opportunities vs businesses to gsheet
+        publisher.update(opportunities_vs_businesses, 5)
 
-    # save opportunities vs businesses to gsheet
-    save_files.save_to_gsheet(opportunities_vs_businesses, "Procurement Data New", 5)
+        # write both tabs in one batch request
+        publisher.publish()
 
 
 
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import threading
+import contextlib
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+# Where run reports and profiles are written
+REPORT_DIR = '../data/reports'
+
+# Set to 'cprofile' or 'pyinstrument' to profile the blocks wrapped in `profiled`
+PROFILE_ENV_VAR = 'PROCUREMENT_PROFILE'
+
+# How often peak RSS is sampled during a stage (seconds)
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Upper bounds (ms) of the HTTP latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Known services by host name
+SERVICES = {
+    'salesforce.com': 'salesforce',
+    'data.lacity.org': 'socrata',
+    'data.lacounty.gov': 'socrata',
+    'arcgis.com': 'arcgis',
+    'googleapis.com': 'sheets',
+}
+
+
+def get_rss() -> int:
+    """
+    Returns the current resident set size of this process in bytes (0 if it cannot be read).
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def get_service(host: str) -> str:
+    for suffix, service in SERVICES.items():
+        if host == suffix or host.endswith('.' + suffix):
+            return service
+    return 'other'
+
+
+class RunReport:
+    """
+    Collects per-stage timings, peak RSS, row counts and metrics plus per-host HTTP statistics for one run.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc)
+        self.stages = []
+        self.metrics = {}
+        self.http = {}
+        # Records of the stages currently running (innermost last)
+        self.active = []
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, rows_in: int = None):
+        """
+        Times the wrapped block and samples its peak RSS. Yields the stage record, which the block
+        can update with `rows_out` and other metrics (e.g. `record['rows_out'] = len(df)`).
+        """
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        peak = [get_rss()]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(RSS_SAMPLE_INTERVAL):
+                peak[0] = max(peak[0], get_rss())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        self.active.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self.active.remove(record)
+            done.set()
+            sampler.join()
+            record['peak_rss_bytes'] = max(peak[0], get_rss())
+            with self.lock:
+                self.stages.append(record)
+
+    def record_metric(self, name: str, value) -> None:
+        """
+        Attaches a metric (e.g. a sanity-check residual) to the innermost running stage, or to the run itself.
+        """
+        target = self.active[-1] if self.active else self.metrics
+        target[name] = value
+
+    def record_request(self, url: str, method: str, status: int, seconds: float, bytes_sent: int, bytes_received: int) -> None:
+        """
+        Adds one HTTP request to the per-host statistics.
+        """
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            stats = self.http.setdefault(host, {
+                'service': get_service(host),
+                'requests': 0,
+                'errors': 0,
+                'bytes_sent': 0,
+                'bytes_received': 0,
+                'seconds': 0.0,
+                'latency_ms_histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            })
+            stats['requests'] += 1
+            stats['errors'] += int(status is None or status >= 400)
+            stats['bytes_sent'] += bytes_sent
+            stats['bytes_received'] += bytes_received
+            stats['seconds'] += seconds
+            bucket = sum(seconds * 1000 > bound for bound in LATENCY_BUCKETS_MS)
+            stats['latency_ms_histogram'][bucket] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'run': self.name,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'stages': self.stages,
+            'metrics': self.metrics,
+            'http': {
+                'latency_ms_buckets': LATENCY_BUCKETS_MS,
+                'hosts': self.http,
+            },
+        }
+
+
+# Report of the current run (a throwaway report until `start_run` is called)
+RUN = RunReport('unnamed')
+_original_send = None
+
+
+def start_run(name: str) -> RunReport:
+    """
+    Starts a new run report and instruments HTTP requests made through `requests` (Salesforce, Socrata, ArcGIS).
+    """
+    global RUN
+    RUN = RunReport(name)
+    instrument_http()
+    return RUN
+
+
+def stage(name: str, rows_in: int = None):
+    """
+    Shortcut for `RUN.stage`.
+    """
+    return RUN.stage(name, rows_in)
+
+
+def record_metric(name: str, value) -> None:
+    """
+    Shortcut for `RUN.record_metric`.
+    """
+    RUN.record_metric(name, value)
+
+
+def record_request(url: str, method: str, status: int, seconds: float, bytes_sent: int = 0, bytes_received: int = 0) -> None:
+    """
+    Records a request made outside `requests` (e.g. the Google Sheets client).
+    """
+    RUN.record_request(url, method, status, seconds, bytes_sent, bytes_received)
+
+
+def instrument_http() -> None:
+    """
+    Wraps `requests.Session.send` so every request is timed and counted in the current run report.
+    """
+    global _original_send
+    if _original_send is not None:
+        return
+    import requests
+    _original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        start = time.perf_counter()
+        response = None
+        try:
+            response = _original_send(session, request, **kwargs)
+            return response
+        finally:
+            body = request.body
+            if isinstance(body, str):
+                body = body.encode()
+            RUN.record_request(
+                request.url,
+                request.method,
+                response.status_code if response is not None else None,
+                time.perf_counter() - start,
+                len(body) if isinstance(body, bytes) else 0,
+                len(response.content) if response is not None and not kwargs.get('stream') else 0,
+            )
+
+    requests.Session.send = send
+
+
+def write_report(report_dir: str = REPORT_DIR) -> str:
+    """
+    Writes the current run report as JSON and returns its path.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, '{}_{}.json'.format(RUN.name, RUN.started_at.strftime('%Y%m%dT%H%M%S')))
+    with open(path, 'w') as f:
+        json.dump(RUN.to_dict(), f, indent=2, default=str)
+    return path
+
+
+@contextlib.contextmanager
+def profiled(name: str, report_dir: str = REPORT_DIR):
+    """
+    Profiles the wrapped block with cProfile or pyinstrument if requested through `PROCUREMENT_PROFILE`,
+    writing `<run>_<name>.prof` (cProfile) or `<run>_<name>.html` (pyinstrument). Does nothing otherwise.
+    """
+    profiler_name = os.environ.get(PROFILE_ENV_VAR, '').lower()
+    if profiler_name not in ('cprofile', 'pyinstrument'):
+        yield
+        return
+
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, '{}_{}'.format(RUN.name, name))
+    if profiler_name == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path + '.prof')
+    else:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path + '.html', 'w') as f:
+                f.write(profiler.output_html())
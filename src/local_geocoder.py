@@ -0,0 +1,224 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Countywide address points export (https://data.lacounty.gov) and the index built from it
+ADDRESS_POINTS_FILE = '../data/address_points.csv'
+ADDRESS_INDEX_DIR = '../data/address_index'
+
+# Mapping from the county export's columns to the names used in the index
+ADDRESS_POINT_COLUMNS = {
+    'Number': 'number',
+    'PreDirAbbr': 'pre_dir',
+    'StreetName': 'street_name',
+    'PostType': 'post_type',
+    'PostDir': 'post_dir',
+    'ZipCode': 'zip',
+    'LAT': 'y',
+    'LON': 'x',
+}
+
+# Minimum trigram (Jaccard) similarity for accepting a fuzzy street match
+FUZZY_THRESHOLD = 0.5
+
+# Canonical USPS-style abbreviations for street types and directionals
+STREET_ABBREVIATIONS = {
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'STREET': 'ST', 'AVENUE': 'AVE', 'AV': 'AVE', 'BOULEVARD': 'BLVD', 'DRIVE': 'DR',
+    'ROAD': 'RD', 'LANE': 'LN', 'PLACE': 'PL', 'COURT': 'CT', 'CIRCLE': 'CIR',
+    'HIGHWAY': 'HWY', 'PARKWAY': 'PKWY', 'TERRACE': 'TER', 'WAY': 'WAY', 'SQUARE': 'SQ',
+    'TRAIL': 'TRL', 'PLAZA': 'PLZ', 'CENTER': 'CTR', 'FREEWAY': 'FWY',
+}
+UNIT_PATTERN = r'\s+(?:SUITE|STE|UNIT|APT|APARTMENT|RM|ROOM|FL|FLOOR|BLDG|BUILDING|SPC|SPACE|NO)\b.*$'
+
+
+def normalize_street_name(street: pd.Series) -> pd.Series:
+    """
+    Canonicalizes street names: uppercase, punctuation removed, unit designators dropped and
+    street types/directionals abbreviated.
+    """
+    abbreviation_pattern = r'\b(?:{})\b'.format('|'.join(STREET_ABBREVIATIONS))
+    return (
+        street
+        .fillna('')
+        .astype(str)
+        .str.upper()
+        .str.replace('#', ' UNIT ', regex=False)
+        .str.replace(r'[^A-Z0-9 ]', ' ', regex=True)
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+        .str.replace(UNIT_PATTERN, '', regex=True)
+        .str.replace(abbreviation_pattern, lambda m: STREET_ABBREVIATIONS[m.group(0)], regex=True)
+    )
+
+
+def split_street_address(address: pd.Series) -> pd.DataFrame:
+    """
+    Splits a full street address ('25000 Avenue Stanford Suite 117') into its house number and
+    canonical street name. Addresses without a leading house number (e.g. PO boxes) get NaN.
+    """
+    parts = (
+        address
+        .fillna('')
+        .astype(str)
+        .str.upper()
+        .str.strip()
+        .str.extract(r'^(?P<number>\d+)[A-Z]?\s+(?P<street>.+)$')
+    )
+    parts['street'] = normalize_street_name(parts['street'])
+    return parts
+
+
+def normalize_zip(zip_code: pd.Series) -> pd.Series:
+    """
+    Extracts the 5-digit ZIP code from ZIP5/ZIP9 values (including ones read in as floats).
+    """
+    return zip_code.astype(str).str.extract(r'^(\d{5})', expand=False)
+
+
+def get_trigrams(text: str) -> set:
+    """
+    Returns the set of character trigrams of a (padded) string.
+    """
+    padded = '  {} '.format(text)
+    return {padded[i:i+3] for i in range(len(padded) - 2)}
+
+
+def build_address_index(source=ADDRESS_POINTS_FILE, index_dir=ADDRESS_INDEX_DIR, columns=ADDRESS_POINT_COLUMNS):
+    """
+    Builds the on-disk geocoding index from the county address points file:
+    `points.parquet` maps (house number, canonical street, ZIP) to a point,
+    `streets.parquet` lists each distinct (ZIP, street) and
+    `trigrams.parquet` maps each street trigram to the streets containing it.
+    """
+    points = pd.read_csv(source, usecols=list(columns), dtype=str).rename(columns=columns)
+
+    # Combining street name parts into a single canonical street name
+    street = points['pre_dir'].fillna('').str.cat(
+        [points['street_name'].fillna(''), points['post_type'].fillna(''), points['post_dir'].fillna('')],
+        sep=' '
+    )
+    index = (
+        pd.DataFrame({
+            'number': points['number'].str.strip(),
+            'street': normalize_street_name(street),
+            'zip': normalize_zip(points['zip']),
+            'x': pd.to_numeric(points['x'], errors='coerce'),
+            'y': pd.to_numeric(points['y'], errors='coerce'),
+        })
+        .dropna()
+        .drop_duplicates(subset=['number', 'street', 'zip'])
+        .reset_index(drop=True)
+    )
+
+    # Distinct streets per ZIP code, and a trigram -> street posting list for fuzzy matches
+    streets = index[['zip', 'street']].drop_duplicates().reset_index(drop=True)
+    streets['street_id'] = np.arange(len(streets), dtype='int64')
+    streets['n_trigrams'] = streets['street'].map(lambda s: len(get_trigrams(s))).astype('int64')
+    trigrams = (
+        streets[['street_id']]
+        .assign(trigram=streets['street'].map(lambda s: sorted(get_trigrams(s))))
+        .explode('trigram')
+        .reset_index(drop=True)
+    )
+
+    os.makedirs(index_dir, exist_ok=True)
+    index.to_parquet(os.path.join(index_dir, 'points.parquet'), index=False)
+    streets.to_parquet(os.path.join(index_dir, 'streets.parquet'), index=False)
+    trigrams.to_parquet(os.path.join(index_dir, 'trigrams.parquet'), index=False)
+
+
+def load_address_index(source=ADDRESS_POINTS_FILE, index_dir=ADDRESS_INDEX_DIR):
+    """
+    Loads the geocoding index, building it first if only the address points file is available.
+    Returns None if neither exists so every address falls back to ArcGIS.
+    """
+    if not os.path.exists(os.path.join(index_dir, 'points.parquet')):
+        if not os.path.exists(source):
+            print("No address points file found at {}. Skipping local geocoding.".format(source))
+            return None
+        build_address_index(source, index_dir)
+
+    streets = pd.read_parquet(os.path.join(index_dir, 'streets.parquet'))
+    trigrams = pd.read_parquet(os.path.join(index_dir, 'trigrams.parquet'))
+    trigrams['zip'] = streets['zip'].to_numpy()[trigrams['street_id'].to_numpy()]
+    street_ids = trigrams['street_id'].to_numpy()
+    return {
+        'points': pd.read_parquet(os.path.join(index_dir, 'points.parquet')),
+        'streets': streets,
+        # (ZIP, trigram) -> array of the ids of that ZIP code's streets containing the trigram
+        'postings': {key: street_ids[rows] for key, rows in trigrams.groupby(['zip', 'trigram'], sort=False).indices.items()},
+    }
+
+
+def match_street(street: str, zip_code: str, address_index: dict):
+    """
+    Finds the most similar indexed street within the same ZIP code by trigram similarity.
+    Only the postings of that ZIP code are read, so a lookup never touches other ZIP codes' streets.
+    Returns the matched street name and its score, or (None, 0) if nothing passes `FUZZY_THRESHOLD`.
+    """
+    query_trigrams = get_trigrams(street)
+    postings = address_index['postings']
+    candidates = [postings[(zip_code, t)] for t in query_trigrams if (zip_code, t) in postings]
+    if not candidates:
+        return None, 0
+
+    # Jaccard similarity between the query and each candidate street (shared trigrams per street)
+    street_ids, shared = np.unique(np.concatenate(candidates), return_counts=True)
+    streets = address_index['streets'].iloc[street_ids]
+    scores = shared / (len(query_trigrams) + streets['n_trigrams'].to_numpy() - shared)
+    best = scores.argmax()
+    if scores[best] < FUZZY_THRESHOLD:
+        return None, 0
+    return streets['street'].to_numpy()[best], scores[best]
+
+
+def to_location(object_id, x, y, score):
+    """
+    Formats a local match like an ArcGIS `geocodeAddresses` location so it can be combined with its results.
+    """
+    return {
+        'address': '',
+        'location': {'x': float(x), 'y': float(y)},
+        'score': float(score),
+        'attributes': {'ResultID': int(object_id), 'Status': 'M', 'Score': float(score), 'Loc_name': 'LocalIndex'},
+    }
+
+
+def geocode_addresses(reduced_df: pd.DataFrame, address_index: dict):
+    """
+    Resolves the addresses in `reduced_df` (from `format_data`) against the local index.
+    Returns a list of ArcGIS-style locations for the resolved addresses and the unresolved rows of `reduced_df`.
+    """
+    if address_index is None or reduced_df.empty:
+        return [], reduced_df
+
+    query = split_street_address(reduced_df['Address'])
+    query['zip'] = normalize_zip(reduced_df['Postal']).to_numpy()
+    query['OBJECTID'] = reduced_df['OBJECTID'].to_numpy()
+    query = query.dropna(subset=['number', 'street', 'zip'])
+
+    # Exact matches on (house number, canonical street, ZIP)
+    exact = query.merge(address_index['points'], how='inner', on=['number', 'street', 'zip'])
+    locations = [
+        to_location(object_id, x, y, 100)
+        for object_id, x, y in zip(exact['OBJECTID'], exact['x'], exact['y'])
+    ]
+
+    # Fuzzy street matches for the rest, keeping the exact house number
+    remaining = query[~query['OBJECTID'].isin(exact['OBJECTID'])]
+    fuzzy = []
+    for object_id, number, street, zip_code in zip(remaining['OBJECTID'], remaining['number'], remaining['street'], remaining['zip']):
+        matched_street, score = match_street(street, zip_code, address_index)
+        if matched_street is not None:
+            fuzzy.append({'OBJECTID': object_id, 'number': number, 'street': matched_street, 'zip': zip_code, 'score': score})
+    if fuzzy:
+        fuzzy = pd.DataFrame(fuzzy).merge(address_index['points'], how='inner', on=['number', 'street', 'zip'])
+        locations.extend(
+            to_location(object_id, x, y, 100 * score)
+            for object_id, x, y, score in zip(fuzzy['OBJECTID'], fuzzy['x'], fuzzy['y'], fuzzy['score'])
+        )
+
+    resolved_ids = {location['attributes']['ResultID'] for location in locations}
+    print("Resolved {} of {} addresses locally.".format(len(resolved_ids), len(reduced_df)))
+    return locations, reduced_df[~reduced_df['OBJECTID'].isin(resolved_ids)]
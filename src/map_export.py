@@ -0,0 +1,231 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Outputs for the award points map layer
+GEOPARQUET_FILE = '../data/award_points.parquet'
+TILE_DIR = '../data/tiles'
+
+# Rows per parquet row group (each gets its own bbox statistics)
+ROW_GROUP_SIZE = 10000
+
+# Zoom levels to pre-generate tiles for, tile extent and the aggregation grid (cells per tile side)
+MIN_ZOOM = 0
+MAX_ZOOM = 14
+TILE_EXTENT = 4096
+CELLS_PER_TILE = 64
+
+# Order of the Hilbert curve used for sorting (2^order cells per side)
+HILBERT_ORDER = 16
+
+# TileJSON bounds of a layer without points (the Web Mercator extent)
+WORLD_BOUNDS = [-180.0, -85.0511, 180.0, 85.0511]
+
+POINT_COLUMNS = [
+    'Account__r.Name',
+    'Opportunity__r.Name',
+    'Award_Amount__c',
+    'DBE__c',
+    'MBE__c',
+    'WBE__c',
+    'Category',
+    'bid_due_year',
+]
+
+
+def hilbert_index(x: np.ndarray, y: np.ndarray, order: int = HILBERT_ORDER) -> np.ndarray:
+    """
+    Returns the distance along a Hilbert curve for integer grid coordinates in [0, 2^order).
+    Vectorized version of the classic `xy2d` algorithm.
+    """
+    x = x.astype('int64').copy()
+    y = y.astype('int64').copy()
+    d = np.zeros(len(x), dtype='int64')
+    n = 1 << order
+    s = n >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype('int64')
+        ry = ((y & s) > 0).astype('int64')
+        d += s * s * ((3 * rx) ^ ry)
+
+        # Rotating the quadrant
+        flip = (ry == 0) & (rx == 1)
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ry == 0
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return d
+
+
+def sort_by_hilbert(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sorts points along a Hilbert curve over their bounding box so nearby points end up in the same row groups.
+    """
+    if df.empty:
+        return df.reset_index(drop=True)
+    lon, lat = df['Longitude'].to_numpy(), df['Latitude'].to_numpy()
+    cells = (1 << HILBERT_ORDER) - 1
+    x = ((lon - lon.min()) / max(lon.max() - lon.min(), 1e-12) * cells).round()
+    y = ((lat - lat.min()) / max(lat.max() - lat.min(), 1e-12) * cells).round()
+    return df.iloc[np.argsort(hilbert_index(x, y), kind='stable')].reset_index(drop=True)
+
+
+def points_to_wkb(lon: np.ndarray, lat: np.ndarray) -> list:
+    """
+    Encodes points as little-endian WKB (byte order, geometry type 1, x, y) without a per-row geometry library call.
+    """
+    wkb = np.empty(len(lon), dtype=[('order', 'u1'), ('type', '<u4'), ('x', '<f8'), ('y', '<f8')])
+    wkb['order'] = 1
+    wkb['type'] = 1
+    wkb['x'] = lon
+    wkb['y'] = lat
+    raw = wkb.tobytes()
+    size = wkb.dtype.itemsize
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+def write_geoparquet(df: pd.DataFrame, path: str = GEOPARQUET_FILE, row_group_size: int = ROW_GROUP_SIZE) -> None:
+    """
+    Writes the categorized award points as GeoParquet (WKB point geometry + a `bbox` covering column),
+    sorted along a Hilbert curve so each row group covers a compact area. Without points, an empty
+    layer (no `bbox` in the geo metadata) is written.
+    """
+    df = sort_by_hilbert(df)
+    lon, lat = df['Longitude'].to_numpy(), df['Latitude'].to_numpy()
+
+    table = pa.Table.from_pandas(df[POINT_COLUMNS], preserve_index=False)
+    table = table.append_column('geometry', pa.array(points_to_wkb(lon, lat), type=pa.binary()))
+    table = table.append_column('bbox', pa.StructArray.from_arrays(
+        [pa.array(lon, type=pa.float64()), pa.array(lat, type=pa.float64()),
+         pa.array(lon, type=pa.float64()), pa.array(lat, type=pa.float64())],
+        names=['xmin', 'ymin', 'xmax', 'ymax'],
+    ))
+
+    geometry_metadata = {
+        'encoding': 'WKB',
+        'geometry_types': ['Point'],
+        'covering': {'bbox': {
+            'xmin': ['bbox', 'xmin'], 'ymin': ['bbox', 'ymin'],
+            'xmax': ['bbox', 'xmax'], 'ymax': ['bbox', 'ymax'],
+        }},
+    }
+    if len(df):
+        geometry_metadata['bbox'] = [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())]
+    geo_metadata = {'version': '1.1.0', 'primary_column': 'geometry', 'columns': {'geometry': geometry_metadata}}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'geo': json.dumps(geo_metadata).encode()})
+    pq.write_table(table, path, row_group_size=row_group_size, compression='zstd', write_statistics=True)
+
+
+def read_points_in_bbox(bbox: tuple, path: str = GEOPARQUET_FILE, columns: list = None) -> pd.DataFrame:
+    """
+    Reads the award points within `bbox` (xmin, ymin, xmax, ymax). Row groups whose bbox statistics
+    do not overlap are skipped.
+    """
+    xmin, ymin, xmax, ymax = bbox
+    in_bbox = (
+        (ds.field('bbox', 'xmin') <= xmax) & (ds.field('bbox', 'xmax') >= xmin)
+        & (ds.field('bbox', 'ymin') <= ymax) & (ds.field('bbox', 'ymax') >= ymin)
+    )
+    return ds.dataset(path, format='parquet').to_table(columns=columns, filter=in_bbox).to_pandas()
+
+
+def lonlat_to_tile(lon: np.ndarray, lat: np.ndarray, zoom: int):
+    """
+    Returns fractional Web Mercator tile coordinates for the given zoom level.
+    """
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (lon + 180) / 360 * n
+    y = (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2 * n
+    return x, y
+
+
+def aggregate_tile_points(df: pd.DataFrame, zoom: int) -> pd.DataFrame:
+    """
+    Aggregates award points into grid cells within each tile at `zoom`, per `Category`.
+    Returns one row per (tile, cell, category) with the award count, total award amount and
+    the cell's mean position in tile coordinates.
+    """
+    x, y = lonlat_to_tile(df['Longitude'].to_numpy(), df['Latitude'].to_numpy(), zoom)
+    cell_size = TILE_EXTENT // CELLS_PER_TILE
+    px = ((x % 1) * TILE_EXTENT).astype('int64')
+    py = ((y % 1) * TILE_EXTENT).astype('int64')
+    return (
+        pd.DataFrame({
+            'tile_x': x.astype('int64'),
+            'tile_y': y.astype('int64'),
+            'cell_x': px // cell_size,
+            'cell_y': py // cell_size,
+            'px': px,
+            'py': py,
+            'Category': df['Category'].to_numpy(),
+            'Award_Amount__c': df['Award_Amount__c'].fillna(0).to_numpy(),
+        })
+        .groupby(['tile_x', 'tile_y', 'cell_x', 'cell_y', 'Category'])
+        .agg(count=('px', 'size'), award_amount=('Award_Amount__c', 'sum'), px=('px', 'mean'), py=('py', 'mean'))
+        .reset_index()
+    )
+
+
+def write_vector_tiles(df: pd.DataFrame, tile_dir: str = TILE_DIR, min_zoom: int = MIN_ZOOM, max_zoom: int = MAX_ZOOM) -> None:
+    """
+    Pre-generates Mapbox vector tiles (`{z}/{x}/{y}.mvt`) of award points aggregated by `Category`,
+    plus a TileJSON `metadata.json`, so the map only loads the tiles in view. Without points only
+    the metadata is written.
+    """
+    import mapbox_vector_tile
+
+    if os.path.exists(tile_dir):
+        shutil.rmtree(tile_dir)
+    os.makedirs(tile_dir)
+
+    for zoom in range(min_zoom, max_zoom + 1):
+        cells = aggregate_tile_points(df, zoom)
+        for (tile_x, tile_y), tile in cells.groupby(['tile_x', 'tile_y']):
+            features = [
+                {
+                    'geometry': 'POINT ({} {})'.format(int(px), int(py)),
+                    'properties': {'Category': category, 'count': int(count), 'award_amount': float(amount)},
+                }
+                for px, py, category, count, amount in zip(tile.px, tile.py, tile.Category, tile['count'], tile.award_amount)
+            ]
+            data = mapbox_vector_tile.encode(
+                [{'name': 'awards', 'features': features}],
+                default_options={'extents': TILE_EXTENT, 'y_coord_down': True},
+            )
+            os.makedirs(os.path.join(tile_dir, str(zoom), str(tile_x)), exist_ok=True)
+            with open(os.path.join(tile_dir, str(zoom), str(tile_x), '{}.mvt'.format(tile_y)), 'wb') as f:
+                f.write(data)
+
+    tilejson = {
+        'tilejson': '3.0.0',
+        'tiles': ['{z}/{x}/{y}.mvt'],
+        'minzoom': min_zoom,
+        'maxzoom': max_zoom,
+        'bounds': [
+            float(df['Longitude'].min()), float(df['Latitude'].min()),
+            float(df['Longitude'].max()), float(df['Latitude'].max()),
+        ] if len(df) else WORLD_BOUNDS,
+        'vector_layers': [{
+            'id': 'awards',
+            'fields': {'Category': 'String', 'count': 'Number', 'award_amount': 'Number'},
+        }],
+    }
+    with open(os.path.join(tile_dir, 'metadata.json'), 'w') as f:
+        json.dump(tilejson, f)
+
+
+def export_map_layer(df: pd.DataFrame) -> None:
+    """
+    Writes the categorized award points (from `additional_naics_data_processing.py`) as a
+    Hilbert-sorted GeoParquet file and pre-generated vector tiles for the map.
+    """
+    points = df[df['Latitude'].notnull() & df['Longitude'].notnull()]
+    write_geoparquet(points)
+    write_vector_tiles(points)
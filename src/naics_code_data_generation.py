@@ -10,15 +10,27 @@
 import numpy as np
 import pandas as pd
 import requests
-import collections
+import collections.abc
 import json
 import itertools
 import re
-import pygsheets
 import warnings
-from pandas.core.common import SettingWithCopyWarning
-warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
+# SettingWithCopyWarning moved to pandas.errors in pandas 1.5 and is gone with copy-on-write (pandas 3)
+try:
+    from pandas.errors import SettingWithCopyWarning
+except ImportError:
+    try:
+        from pandas.core.common import SettingWithCopyWarning
+    except ImportError:
+        SettingWithCopyWarning = None
+if SettingWithCopyWarning is not None:
+    warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
 import save_files
+import artifacts
+import bootstrap
+import opportunity_counts
+import vendor_resolution
+import instrumentation
 
 
 def get_http(ep):
@@ -88,7 +100,7 @@ def flatten(d, parent_key='', sep='.'):
     items = []
     for k, v in d.items():
         new_key = parent_key + sep + k if parent_key else k
-        if isinstance(v, collections.MutableMapping):
+        if isinstance(v, collections.abc.MutableMapping):
             items.extend(flatten(v, new_key, sep=sep).items())
         else:
             items.append((new_key, v))
@@ -199,6 +211,7 @@ def make_request_and_transform(endpoint, full_url=True, full_data=False):
             data = res.json()
             new_df = create_df_from_req(data)
             df = pd.concat([df, new_df], ignore_index=True)
+            instrumentation.record_metric('rows_fetched', len(df))
             try:
                 print("Finished batch request! Currently on row {}".format(data['nextRecordsUrl'].split('-')[-1]))
             except KeyError:
@@ -221,32 +234,39 @@ opp_naics_soql = 'SELECT Opportunity__r.Id,Opportunity__r.Account.Name,NAICS_Cod
 
 
 # ## Joining tables
-awards = get_data_from_soql(awards_soql, full_data=True)
-opp_naics = get_data_from_soql(opp_naics_soql, full_data=True)
-# acc_naics = get_data_from_soql(acc_naics_soql, full_data=True)
-
+def join_tables(awards, opp_naics):
+    """
+    Joins awards onto their opportunities' NAICS codes and removes DWP, LAWA, and POLA rows.
+    """
+    merged_data = (
+        awards
+        .merge(opp_naics, left_on='Opportunity__r.Id', right_on='Opportunity__r.Id')
+        .rename(columns={'NAICS_Code__r.Name': 'Opportunity_NAICS'})
+        # These two columns are to check the account's NAICS codes as well-- may be useful for the future?
+        # Currently, this overmerges data and does not follow the Salesforce report.
+        # .merge(acc_naics, left_on='Account__c', right_on='Account__c')
+        # .rename(columns={'NAICS_Code__r.Name': 'Account_NAICS'})
+    )
 
-merged_data = (
-    awards
-    .merge(opp_naics, left_on='Opportunity__r.Id', right_on='Opportunity__r.Id')
-    .rename(columns={'NAICS_Code__r.Name': 'Opportunity_NAICS'})
-#   These two columns are to check the account's NAICS codes as well-- may be useful for the future?
-#   Currently, this overmerges data and does not follow the Salesforce report.
-#     .merge(acc_naics, left_on='Account__c', right_on='Account__c')
-#     .rename(columns={'NAICS_Code__r.Name': 'Account_NAICS'})
-)
+    # Removing rows with DWP, LAWA, and POLA data to unskew data
+    all_data = merged_data[~merged_data['Opportunity__r.Account.Name'].isin(['Water & Power', 'Airports, Los Angeles World', 'Harbor Department, Port of Los Angeles'])]
+    all_data = all_data.drop(columns=['Opportunity__r.Account'], errors='ignore')
+    return all_data
 
-# Removing rows with DWP, LAWA, and POLA data to unskew data
-all_data = merged_data[~merged_data['Opportunity__r.Account.Name'].isin(['Water & Power', 'Airports, Los Angeles World', 'Harbor Department, Port of Los Angeles'])]
-all_data.drop(columns=['Opportunity__r.Account'], inplace=True)
-all_data.head()
 
-# Exporting `all_data` to CSV to be used in a different script
-all_data.to_csv('../data/all_naics_data.csv', index=False)
+def export_all_data(all_data, opp_naics):
+    """
+    Exports `all_data` (and its de-duplicated, NAICS-free version) and `opp_naics` to be used in a different script
+    (parquet artifact + CSV copy).
+    """
+    artifacts.write_artifact(opp_naics, 'opp_naics')
+    artifacts.write_artifact(all_data, 'all_naics_data')
+    all_data.to_csv('../data/all_naics_data.csv', index=False)
 
-# Removing repeated rows split up by NAICS code by removing NAICS code and dropping duplicates
-all_amount_data = all_data.drop(columns=['Opportunity_NAICS', 'NAICS_Code__r.NAICS_Description__c']).drop_duplicates()
-all_amount_data.to_csv('../data/all_data.csv', index=False)
+    # Removing repeated rows split up by NAICS code by removing NAICS code and dropping duplicates
+    all_amount_data = all_data.drop(columns=['Opportunity_NAICS', 'NAICS_Code__r.NAICS_Description__c']).drop_duplicates()
+    artifacts.write_artifact(all_amount_data, 'all_data')
+    all_amount_data.to_csv('../data/all_data.csv', index=False)
 
 
 def data_to_business_enterprise(data):
@@ -269,7 +289,7 @@ def data_to_business_enterprise(data):
     # Constructing the entire dataframe
     total_data = []
     for func in all_funcs:
-        total_data.append(all_data.groupby(['Opportunity_NAICS', 'NAICS_Code__r.NAICS_Description__c']).apply(func))
+        total_data.append(data.groupby(['Opportunity_NAICS', 'NAICS_Code__r.NAICS_Description__c']).apply(func))
     total_data = pd.concat(total_data, axis=1)
     
     # Renaming + re-ordering columns
@@ -313,55 +333,59 @@ def data_to_category_counts(df):
     """
     Extracts opportunity category counts for each NAICS code.
     """
+    encoded = opportunity_counts.encode_opportunities(df, naics_column='Opportunity_NAICS')
+    counts = opportunity_counts.count_opportunities(encoded, exclude_departments=False)
+    category_columns = [opportunity_counts.CATEGORY_COLUMNS.get(c, c) for c in encoded['categories']]
+    return counts.loc[counts[category_columns].sum(axis=1) > 0, ['Opportunity_NAICS'] + category_columns]
+
+
+def data_to_naics_opp_counts(opp_naics_df):
+    """
+    Takes the NAICS_Opportunity dataframe and gets the total opportunity count by NAICS code (DWP, LAWA, and POLA excluded).
+    """
+    encoded = opportunity_counts.encode_opportunities(opp_naics_df)
     return (
-        df.groupby(['Opportunity_NAICS', 'Opportunity__r.Category__c'])
-        .count()
-        .iloc[:,0]
-        .to_frame()
-        .rename(columns={df.columns[0]: 'Count'})
-        .reset_index()
-        .pivot(index='Opportunity_NAICS', columns='Opportunity__r.Category__c', values='Count')
-        .fillna(0)
-        .rename(columns={
-            'Commodity': 'Commodity Count', 
-            'Construction': 'Construction Count', 
-            'Personal Services': 'Personal Services Count'
-        })
-        .reset_index()
+        opportunity_counts.count_opportunities(encoded, exclude_departments=True)
+        [['Opportunity_NAICS', 'Number of Opportunities']]
+        .sort_values(by='Number of Opportunities', ascending=False)
+        .reset_index(drop=True)
     )
 
 
-def data_to_naics_opp_counts(opp_naics_df):
+def data_to_confidence_intervals(data, naics_codes):
     """
-    Takes the NAICS_Opportunity dataframe and gets the total opportunity count by NAICS code.
+    Bootstraps 95% confidence intervals for the DBE, MBE, WBE dollar and contract shares of the given NAICS codes.
     """
-    filtered_df = opp_naics_df[~opp_naics_df['Opportunity__r.Account.Name'].isin([
-        'Water & Power', 
-        'Airports, Los Angeles World', 
-        'Harbor Department, Port of Los Angeles'
-    ])]
+    data = data[data['Opportunity_NAICS'].isin(naics_codes)]
+    intervals = bootstrap.bootstrap_shares(
+        data['Opportunity_NAICS'],
+        data['Award_Amount__c'],
+        data[['DBE__c', 'MBE__c', 'WBE__c']],
+    )
+
+    # Naming the columns after the shares they bound
+    columns = {}
+    for group_type, name in zip(['DBE__c', 'MBE__c', 'WBE__c'], ['DBEs', 'MBEs', 'WBEs']):
+        for share, label in [('dollars', 'Dollars'), ('contracts', 'Contracts')]:
+            for bound in ['low', 'high']:
+                columns['{} {} {}'.format(group_type, share, bound)] = '% {} awarded to {} (95% CI {})'.format(label, name, bound)
     return (
-        filtered_df
-        .groupby(['NAICS_Code__r.Name'])
-        .count()
-        .sort_values(by='Opportunity__r.Id', ascending=False)
+        intervals
+        .rename(columns=columns)
         .reset_index()
-        [['NAICS_Code__r.Name', 'Opportunity__r.Id']]
-        .rename(columns={
-            'NAICS_Code__r.Name': 'Opportunity_NAICS',
-            'Opportunity__r.Id': 'Number of Opportunities'
-        })
+        .rename(columns={'Opportunity_NAICS': 'Opportunity_NAICS_6'})
     )
 
 
-def create_final_df(all_data_df, opp_naics_df):
+def create_final_df(all_data_df, opp_naics_df, confidence_intervals=False):
     """
     Converts inputted dataframe into final Google Sheet.
+    If `confidence_intervals` is true, bootstrapped 95% intervals of the DBE, MBE, WBE shares are appended as columns.
     """
     # Converting and merging dataframes
     counts_df = data_to_naics_opp_counts(opp_naics_df)
-    bus_enterprise_df = data_to_business_enterprise(all_data)
-    cat_counts_df = data_to_category_counts(all_data)
+    bus_enterprise_df = data_to_business_enterprise(all_data_df)
+    cat_counts_df = data_to_category_counts(all_data_df)
     temp = bus_enterprise_df.merge(cat_counts_df, left_on='Opportunity_NAICS', right_on='Opportunity_NAICS')
     final_df = (
         temp
@@ -386,6 +410,11 @@ def create_final_df(all_data_df, opp_naics_df):
         final_df.drop(index=legacy_naics.index, inplace=True)
     
     final_df = final_df[final_df['Number of Opportunities'] >= 100]
+
+    # Appending confidence intervals for the remaining NAICS codes if requested
+    if confidence_intervals:
+        intervals = data_to_confidence_intervals(all_data_df, final_df['Opportunity_NAICS_6'])
+        final_df = final_df.merge(intervals, how='left', on='Opportunity_NAICS_6')
     
     # Cache a parquet file
     final_df.to_parquet("../data/naics_code_analysis.parquet")
@@ -404,7 +433,49 @@ def data_to_sheet(final_df, to_csv=False, to_sheet=False):
     if to_sheet:
         save_files.save_to_gsheet(final_df, file_name = "Procurement Data New", sheet_index = 0)
 
-        
-# Adding generated Salesforce data to Google Sheet
-data = create_final_df(all_data, opp_naics)
-data_to_sheet(data, to_csv=True, to_sheet=True)
\ No newline at end of file
+
+
+def analyze(all_data, opp_naics, confidence_intervals=False):
+    """
+    Builds the NAICS analysis from the joined data and publishes it (CSV + Google Sheet).
+    """
+    # Adding generated Salesforce data to Google Sheet
+    with instrumentation.stage('create_final_df', rows_in=len(all_data)) as stage, instrumentation.profiled('create_final_df'):
+        data = create_final_df(all_data, opp_naics, confidence_intervals)
+        stage['rows_out'] = len(data)
+    with instrumentation.stage('opportunity_counts', rows_in=len(opp_naics)) as stage:
+        counts = opportunity_counts.get_published_counts(opp_naics)
+        counts.to_parquet(opportunity_counts.COUNTS_FILE, index=False)
+        stage['rows_out'] = len(counts)
+    with instrumentation.stage('data_to_sheet', rows_in=len(data)):
+        data_to_sheet(data, to_csv=True, to_sheet=True)
+    return data
+
+
+def main(confidence_intervals=False):
+    instrumentation.start_run('naics_code_data_generation')
+
+    with instrumentation.stage('get_awards') as stage:
+        awards = get_data_from_soql(awards_soql, full_data=True)
+        stage['rows_out'] = len(awards)
+    with instrumentation.stage('get_opp_naics') as stage:
+        opp_naics = get_data_from_soql(opp_naics_soql, full_data=True)
+        stage['rows_out'] = len(opp_naics)
+    # acc_naics = get_data_from_soql(acc_naics_soql, full_data=True)
+
+    with instrumentation.stage('join_tables', rows_in=len(awards) + len(opp_naics)) as stage:
+        all_data = join_tables(awards, opp_naics)
+        stage['rows_out'] = len(all_data)
+    with instrumentation.stage('resolve_vendors', rows_in=len(all_data)) as stage, instrumentation.profiled('resolve_vendors'):
+        all_data = vendor_resolution.add_vendor_ids(all_data)
+        stage['rows_out'] = all_data['vendor_id'].nunique()
+    with instrumentation.stage('export_all_data', rows_in=len(all_data)):
+        export_all_data(all_data, opp_naics)
+
+    analyze(all_data, opp_naics, confidence_intervals)
+
+    instrumentation.write_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Departments left out of the published analysis (DWP, LAWA, POLA skew the data)
+EXCLUDED_DEPARTMENTS = ['Water & Power', 'Airports, Los Angeles World', 'Harbor Department, Port of Los Angeles']
+
+NAICS_LEVELS = [2, 3, 4, 5, 6]
+
+CATEGORY_COLUMNS = {
+    'Commodity': 'Commodity Count',
+    'Construction': 'Construction Count',
+    'Personal Services': 'Personal Services Count',
+}
+
+# Every NAICS level, with and without the excluded departments
+COUNTS_FILE = '../data/opportunity_counts.parquet'
+
+
+def encode_opportunities(df: pd.DataFrame, naics_column: str = 'NAICS_Code__r.Name') -> dict:
+    """
+    Factorizes the NAICS code, category, department and opportunity id of every row once and counts
+    the rows of every (NAICS code, department, category) cell with a single bincount.
+    Missing categories and departments get their own (last) slot; rows without a NAICS code are dropped.
+    """
+    df = df[df[naics_column].notnull()]
+    naics_codes, naics = pd.factorize(df[naics_column].astype(str), sort=True)
+    category_codes, categories = pd.factorize(df['Opportunity__r.Category__c'], sort=True)
+    department_codes, departments = pd.factorize(df['Opportunity__r.Account.Name'], sort=True)
+    opportunity_codes, _ = pd.factorize(df['Opportunity__r.Id'])
+
+    N, D, K = len(naics), len(departments) + 1, len(categories) + 1
+    category_codes = np.where(category_codes < 0, K - 1, category_codes)
+    department_codes = np.where(department_codes < 0, D - 1, department_codes)
+    cells = (naics_codes * D + department_codes) * K + category_codes
+
+    return {
+        'naics': pd.Index(naics),
+        'categories': list(categories),
+        'excluded': np.append(pd.Index(departments).isin(EXCLUDED_DEPARTMENTS), False),
+        'counts': np.bincount(cells, minlength=N * D * K).reshape(N, D, K),
+        'naics_codes': naics_codes,
+        'department_codes': department_codes,
+        'opportunity_codes': opportunity_codes,
+    }
+
+
+def count_opportunities(encoded: dict, naics_level: int = 6, exclude_departments: bool = True) -> pd.DataFrame:
+    """
+    Returns, for every NAICS code at `naics_level` digits with at least one row: the number of rows
+    (`Number of Opportunities`), of distinct opportunities and the rows per category (`<category> Count`).
+    """
+    level_codes, level_naics = pd.factorize(encoded['naics'].str[:naics_level], sort=True)
+    L = len(level_naics)
+    departments = ~encoded['excluded'] if exclude_departments else np.ones(len(encoded['excluded']), dtype=bool)
+
+    # Reducing the cell counts over the included departments and onto the NAICS level
+    counts = np.zeros((L, encoded['counts'].shape[2]), dtype='int64')
+    np.add.at(counts, level_codes, encoded['counts'][:, departments, :].sum(axis=1))
+
+    # An opportunity listed under several codes that share a prefix is counted once at that level
+    rows = departments[encoded['department_codes']]
+    keys = np.unique(encoded['opportunity_codes'][rows] * L + level_codes[encoded['naics_codes'][rows]])
+    distinct = np.bincount(keys % L, minlength=L)
+
+    result = pd.DataFrame({
+        'Opportunity_NAICS': np.asarray(level_naics),
+        'Number of Opportunities': counts.sum(axis=1),
+        'Number of Distinct Opportunities': distinct,
+    })
+    for k, category in enumerate(encoded['categories']):
+        result[CATEGORY_COLUMNS.get(category, category)] = counts[:, k]
+    return result[result['Number of Opportunities'] > 0].reset_index(drop=True)
+
+
+def get_published_counts(opp_naics_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the opportunity counts of every NAICS level, with and without the excluded departments.
+    """
+    encoded = encode_opportunities(opp_naics_df)
+    variants = []
+    for naics_level in NAICS_LEVELS:
+        for exclude_departments in [True, False]:
+            counts = count_opportunities(encoded, naics_level, exclude_departments)
+            counts.insert(0, 'naics_level', naics_level)
+            counts.insert(1, 'excludes_departments', exclude_departments)
+            variants.append(counts)
+    return pd.concat(variants, ignore_index=True).fillna(0)
@@ -0,0 +1,239 @@
+"""
+Local read API over the precomputed parquet outputs (run with `procurement serve`).
+
+    GET /tables                      lists the tables with their row counts, columns and fingerprints
+    GET /tables/<name>?<query>       returns a page of rows
+
+Query parameters:
+    <column>=<value>                 equality filter; append `__ne`, `__lt`, `__lte`, `__gt`, `__gte`
+                                     or `__in` (comma-separated values) to the column for other comparisons
+    sort=<column>,-<column>          sort order (`-` for descending)
+    columns=<column>,<column>        columns to return
+    limit=<n>&offset=<n>             pagination (default limit 100)
+"""
+import os
+import json
+import functools
+from urllib.parse import parse_qsl
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Served tables and the parquet files they are read from
+TABLES = {
+    'naics_analysis': '../data/naics_code_analysis.parquet',
+    'opportunity_counts': '../data/opportunity_counts.parquet',
+    'percents_by_year': '../data/percents_by_year.parquet',
+    'percents_by_month': '../data/percents_by_month.parquet',
+    'opportunities_vs_businesses': '../data/opportunities_vs_businesses.parquet',
+    'awards_by_location': '../data/awards_by_location.parquet',
+    'disparity_index': '../data/disparity_index.parquet',
+    'award_amount_quantiles': '../data/award_amount_quantiles.parquet',
+}
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+
+# Number of encoded query results kept in memory
+CACHE_SIZE = 1024
+
+OPERATORS = {
+    'eq': pc.equal,
+    'ne': pc.not_equal,
+    'lt': pc.less,
+    'lte': pc.less_equal,
+    'gt': pc.greater,
+    'gte': pc.greater_equal,
+}
+
+# Table name -> (fingerprint, Arrow table) of the version currently loaded
+LOADED = {}
+
+
+class QueryError(ValueError):
+    """
+    Raised for requests that name unknown columns or carry malformed parameters.
+    """
+
+
+def get_fingerprint(name: str) -> tuple:
+    """
+    Identifies the current version of a table's file by its modification time and size.
+    Raises KeyError for unknown tables and FileNotFoundError for tables that haven't been written yet.
+    """
+    stat = os.stat(TABLES[name])
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_table(name: str, fingerprint: tuple) -> pa.Table:
+    """
+    Returns the table, memory-mapping its parquet file again only when the fingerprint has changed.
+    """
+    if name not in LOADED or LOADED[name][0] != fingerprint:
+        table = pq.read_table(TABLES[name], memory_map=True)
+        # Dropping the index pandas stores alongside the data
+        table = table.select([c for c in table.column_names if not c.startswith('__index_level_')])
+        LOADED[name] = (fingerprint, table)
+    return LOADED[name][1]
+
+
+def parse_query(query_string: str) -> tuple:
+    """
+    Parses the query string into a canonical (filters, sort, columns, limit, offset) tuple,
+    so equivalent requests share a cache entry.
+    """
+    filters, sort, columns = [], (), None
+    limit, offset = DEFAULT_LIMIT, 0
+    for key, value in parse_qsl(query_string, keep_blank_values=True):
+        if key == 'sort':
+            sort = tuple(v for v in value.split(',') if v)
+        elif key == 'columns':
+            columns = tuple(v for v in value.split(',') if v)
+        elif key in ('limit', 'offset'):
+            try:
+                number = int(value)
+            except ValueError:
+                raise QueryError('{} must be an integer'.format(key))
+            if number < 0:
+                raise QueryError('{} must not be negative'.format(key))
+            if key == 'limit':
+                limit = min(number, MAX_LIMIT)
+            else:
+                offset = number
+        else:
+            column, _, operator = key.rpartition('__')
+            if operator not in OPERATORS and operator != 'in':
+                column, operator = key, 'eq'
+            filters.append((column, operator, value))
+    return tuple(sorted(filters)), sort, columns, limit, offset
+
+
+def filter_table(table: pa.Table, filters: tuple) -> pa.Table:
+    """
+    Applies the (column, operator, value) filters, casting each value to its column's type.
+    """
+    if not filters:
+        return table
+    mask = None
+    for column, operator, value in filters:
+        if column not in table.column_names:
+            raise QueryError('Unknown column: {}'.format(column))
+        field_type = table.schema.field(column).type
+        try:
+            if operator == 'in':
+                condition = pc.is_in(table[column], value_set=pc.cast(pa.array(value.split(',')), field_type))
+            else:
+                condition = OPERATORS[operator](table[column], pc.cast(pa.scalar(value), field_type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            raise QueryError('Invalid value for {}: {}'.format(column, value))
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return table.filter(mask)
+
+
+def encode_rows(table: pa.Table) -> list:
+    """
+    Converts a page of rows to JSON-ready records, with NaN sent as null.
+    """
+    columns = []
+    for column in table.columns:
+        if pa.types.is_floating(column.type):
+            column = pc.if_else(pc.is_nan(column), pa.scalar(None, column.type), column)
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=table.column_names).to_pylist()
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def run_query(name: str, fingerprint: tuple, filters: tuple, sort: tuple, columns: tuple, limit: int, offset: int) -> bytes:
+    """
+    Runs a query and returns the encoded response body. Results are cached by table fingerprint,
+    so a rewritten file is never answered from a stale entry.
+    """
+    table = filter_table(load_table(name, fingerprint), filters)
+
+    if sort:
+        keys = [(key[1:], 'descending') if key.startswith('-') else (key, 'ascending') for key in sort]
+        unknown = [key for key, _ in keys if key not in table.column_names]
+        if unknown:
+            raise QueryError('Unknown sort column: {}'.format(', '.join(unknown)))
+        table = table.sort_by(keys)
+
+    if columns:
+        unknown = [c for c in columns if c not in table.column_names]
+        if unknown:
+            raise QueryError('Unknown column: {}'.format(', '.join(unknown)))
+        table = table.select(list(columns))
+
+    return json.dumps({
+        'table': name,
+        'total': table.num_rows,
+        'offset': offset,
+        'limit': limit,
+        'rows': encode_rows(table.slice(offset, limit)),
+    }, default=str).encode()
+
+
+def list_tables() -> bytes:
+    tables = []
+    for name in TABLES:
+        try:
+            fingerprint = get_fingerprint(name)
+        except FileNotFoundError:
+            continue
+        table = load_table(name, fingerprint)
+        tables.append({
+            'name': name,
+            'rows': table.num_rows,
+            'columns': table.column_names,
+            'fingerprint': '{}-{}'.format(*fingerprint),
+        })
+    return json.dumps({'tables': tables}).encode()
+
+
+def handle(method: str, path: str, query_string: str) -> tuple:
+    """
+    Returns the (status, body) for a request.
+    """
+    if method != 'GET':
+        return 405, json.dumps({'error': 'Only GET is supported'}).encode()
+
+    parts = [p for p in path.split('/') if p]
+    if parts in ([], ['tables']):
+        return 200, list_tables()
+    if len(parts) != 2 or parts[0] != 'tables':
+        return 404, json.dumps({'error': 'Not found'}).encode()
+
+    name = parts[1]
+    try:
+        fingerprint = get_fingerprint(name)
+    except (KeyError, FileNotFoundError):
+        return 404, json.dumps({'error': 'Unknown table: {}'.format(name)}).encode()
+    try:
+        return 200, run_query(name, fingerprint, *parse_query(query_string))
+    except QueryError as e:
+        return 400, json.dumps({'error': str(e)}).encode()
+
+
+async def app(scope, receive, send):
+    """
+    ASGI application.
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    status, body = handle(scope['method'], scope['path'], scope.get('query_string', b'').decode('latin-1'))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,152 @@
+import os
+import io
+import json
+import hashlib
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+import yaml
+
+import instrumentation
+
+# Catalog of the open data portals (DCAT `data.json` feeds) and the reference datasets read from them
+CATALOG_FILE = '../catalogs/catalog.yml'
+
+# Local snapshots: `<name>.parquet` plus `<name>.json` version metadata, and cached catalog feeds
+REFERENCE_DIR = '../data/reference'
+
+# Row limit passed to Socrata exports (the API returns 1,000 rows by default)
+SOCRATA_ROW_LIMIT = 10000000
+
+
+def load_catalog(catalog_file: str = CATALOG_FILE) -> dict:
+    """
+    Reads the catalog file (sources plus `metadata.reference_datasets`).
+    """
+    with open(catalog_file, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def read_metadata(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_metadata(path: str, metadata: dict) -> None:
+    with open(path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def conditional_get(url: str, metadata: dict, params: dict = None) -> requests.Response:
+    """
+    Requests `url`, revalidating against the ETag / Last-Modified of the cached copy described by `metadata`.
+    A 304 response means the cached copy is still current.
+    """
+    headers = {}
+    if metadata.get('etag'):
+        headers['If-None-Match'] = metadata['etag']
+    if metadata.get('last_modified'):
+        headers['If-Modified-Since'] = metadata['last_modified']
+    response = requests.get(url, params=params, headers=headers)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+
+def get_catalog_datasets(source: str, catalog: dict, reference_dir: str = REFERENCE_DIR) -> list:
+    """
+    Returns the datasets listed in a catalog source's DCAT feed, revalidating the cached feed.
+    """
+    os.makedirs(os.path.join(reference_dir, 'catalogs'), exist_ok=True)
+    path = os.path.join(reference_dir, 'catalogs', source + '.json')
+    metadata_path = os.path.join(reference_dir, 'catalogs', source + '.meta.json')
+    metadata = read_metadata(metadata_path) if os.path.exists(path) else {}
+
+    response = conditional_get(catalog['sources'][source]['args']['url'], metadata)
+    if response.status_code == 304:
+        instrumentation.record_metric('{}_catalog_not_modified'.format(source), True)
+    else:
+        with open(path, 'wb') as f:
+            f.write(response.content)
+        write_metadata(metadata_path, {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        })
+
+    with open(path, 'r') as f:
+        return json.load(f).get('dataset', [])
+
+
+def resolve_dataset(name: str, catalog: dict = None, reference_dir: str = REFERENCE_DIR) -> dict:
+    """
+    Looks a named reference dataset up in its catalog source and returns where to download it from:
+    the Socrata export of the dataset for Socrata portals, otherwise its CSV distribution.
+    """
+    catalog = catalog or load_catalog()
+    spec = catalog['metadata']['reference_datasets'][name]
+    identifier = spec['identifier']
+
+    for dataset in get_catalog_datasets(spec['catalog'], catalog, reference_dir):
+        dataset_id = str(dataset.get('identifier', ''))
+        if dataset_id != identifier and not dataset_id.rstrip('/').endswith('/' + identifier):
+            continue
+        distributions = dataset.get('distribution', [])
+        if dataset_id.startswith('http') and '/api/views/' in dataset_id:
+            # Socrata: the resource export keeps the API field names
+            url = 'https://{}/resource/{}.csv'.format(urlparse(dataset_id).hostname, identifier)
+            params = {'$limit': SOCRATA_ROW_LIMIT}
+        else:
+            csv = [d for d in distributions if d.get('mediaType') == 'text/csv' and d.get('downloadURL')]
+            if not csv:
+                raise ValueError('{} has no CSV distribution in {}'.format(identifier, spec['catalog']))
+            url, params = csv[0]['downloadURL'], None
+        return {
+            'name': name,
+            'catalog': spec['catalog'],
+            'identifier': identifier,
+            'title': dataset.get('title'),
+            'catalog_modified': dataset.get('modified'),
+            'url': url,
+            'params': params,
+        }
+    raise KeyError('{} not found in catalog {}'.format(identifier, spec['catalog']))
+
+
+def get_reference_data(name: str, refresh_catalog: bool = False, reference_dir: str = REFERENCE_DIR) -> pd.DataFrame:
+    """
+    Returns a named reference dataset from its local parquet snapshot, downloading it only if the
+    portal reports a new version (ETag / Last-Modified revalidation). The catalog is only consulted
+    for datasets without a snapshot, or with `refresh_catalog`.
+    """
+    os.makedirs(reference_dir, exist_ok=True)
+    path = os.path.join(reference_dir, name + '.parquet')
+    metadata_path = os.path.join(reference_dir, name + '.json')
+    metadata = read_metadata(metadata_path) if os.path.exists(path) else {}
+
+    if refresh_catalog or not metadata:
+        metadata = {**metadata, **resolve_dataset(name, reference_dir=reference_dir)}
+
+    response = conditional_get(metadata['url'], metadata, metadata.get('params'))
+    now = datetime.now(timezone.utc).isoformat()
+    if response.status_code == 304:
+        instrumentation.record_metric('{}_not_modified'.format(name), True)
+        metadata['checked_at'] = now
+        write_metadata(metadata_path, metadata)
+        return pd.read_parquet(path)
+
+    data = pd.read_csv(io.BytesIO(response.content), dtype=str)
+    data.to_parquet(path, index=False)
+    metadata.update({
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'sha256': hashlib.sha256(response.content).hexdigest(),
+        'rows': len(data),
+        'fetched_at': now,
+        'checked_at': now,
+    })
+    write_metadata(metadata_path, metadata)
+    return data
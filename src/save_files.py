@@ -1,10 +1,9 @@
 import pandas as pd
-import pygsheets
+import numpy as np
 import os
-from google.oauth2 import service_account
 import json
-
-from civis_aqueduct_utils.github import upload_file_to_github
+import time
+import instrumentation
 
 # Constants for loading the file to GitHub
 #TOKEN = os.environ["GITHUB_TOKEN_PASSWORD"]
@@ -17,26 +16,173 @@ DEFAULT_COMMITTER = {
 }
 
 
-# Export dataframe to sheet if `to_sheet` is true
-def save_to_gsheet(df: pd.DataFrame, file_name: str, sheet_index: int):
-    #print(file_name)
+# Local snapshots of what was last published to each worksheet
+SNAPSHOT_DIR = '../data/gsheet_snapshots'
+
+
+def column_letter(col: int) -> str:
+    """
+    Converts a 1-based column number into its A1-notation letters (1 -> 'A', 27 -> 'AA').
+    """
+    letters = ''
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def dataframe_to_grid(df: pd.DataFrame) -> list:
+    """
+    Converts a dataframe into the cell grid written by `set_dataframe` (header row + values, NaN as 'NaN').
+    """
+    values = df.astype(object).where(df.notnull(), 'NaN').astype(str).values.tolist()
+    return [[str(col) for col in df.columns]] + values
+
+
+def diff_grids(old: list, new: list) -> list:
+    """
+    Returns the rectangles of cells that differ between two grids as (row, first col, last col, values)
+    tuples with 0-based inclusive bounds. Cells only present in `old` are cleared with ''.
+    Changed runs on consecutive rows spanning the same columns are merged into a single rectangle.
+    """
+    n_rows = max(len(old), len(new))
+    n_cols = max([len(row) for row in old + new] or [0])
+    padded_old = np.full((n_rows, n_cols), '', dtype=object)
+    padded_new = np.full((n_rows, n_cols), '', dtype=object)
+    for i, row in enumerate(old):
+        padded_old[i, :len(row)] = row
+    for i, row in enumerate(new):
+        padded_new[i, :len(row)] = row
+    changed = padded_old != padded_new
+
+    rectangles = []
+    open_rectangles = {}
+    for r in np.flatnonzero(changed.any(axis=1)):
+        # Contiguous runs of changed columns on this row
+        cols = np.flatnonzero(changed[r])
+        breaks = np.flatnonzero(np.diff(cols) > 1)
+        starts = np.concatenate([[cols[0]], cols[breaks + 1]])
+        ends = np.concatenate([cols[breaks], [cols[-1]]])
+
+        still_open = {}
+        for c0, c1 in zip(starts, ends):
+            rect = open_rectangles.get((c0, c1))
+            if rect is not None and rect['last_row'] == r - 1:
+                rect['last_row'] = r
+            else:
+                rect = {'first_row': r, 'last_row': r, 'first_col': c0, 'last_col': c1}
+                rectangles.append(rect)
+            still_open[(c0, c1)] = rect
+        open_rectangles = still_open
+
+    return [
+        (
+            rect['first_row'], rect['last_row'], rect['first_col'], rect['last_col'],
+            padded_new[rect['first_row']:rect['last_row'] + 1, rect['first_col']:rect['last_col'] + 1].tolist()
+        )
+        for rect in rectangles
+    ]
+
 
-    # Get authorization from `google_credentials.json` file.
-    #gc = pygsheets.authorize(client_secret='../credentials/google_credentials.json')
-    gc = pygsheets.authorize(service_file='../credentials/sa_credentials.json')
+class SheetPublisher:
+    """
+    Publishes dataframes to the worksheets of one Google Sheet.
+    Authorizes and opens the spreadsheet once, queues worksheet updates and writes them
+    with a single values batchUpdate containing only the cells that changed since the last publish.
+    `client` can be any object with pygsheets' `open()` and `sheet.values_batch_update()` (e.g. a local stand-in).
+    """
 
-    # Open the sheet (replace 'Testing Stuff' with correct file name.)
-    sh = gc.open(file_name)
-    #print(sh)
+    def __init__(self, file_name: str, client=None, snapshot_dir: str = SNAPSHOT_DIR, full: bool = False):
+        # Get authorization from the service account file unless a client is passed in.
+        if client is None:
+            import pygsheets
+            client = pygsheets.authorize(service_file='../credentials/sa_credentials.json')
+        self.client = client
+        self.spreadsheet = self.client.open(file_name)
+        self.file_name = file_name
+        self.snapshot_dir = snapshot_dir
+        # Ignore snapshots and rewrite every cell (e.g. if the sheet was edited by hand)
+        self.full = full
+        self.pending = {}
 
-    # Select first sheet
-    wks = sh[sheet_index]
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.publish()
+
+    def snapshot_path(self, sheet_index: int) -> str:
+        return os.path.join(self.snapshot_dir, '{}_{}.json'.format(self.file_name, sheet_index))
+
+    def load_snapshot(self, sheet_index: int) -> list:
+        """
+        Loads the grid last published to a worksheet (empty if there is none or `full` is set).
+        """
+        path = self.snapshot_path(sheet_index)
+        if self.full or not os.path.exists(path):
+            return []
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def update(self, df: pd.DataFrame, sheet_index: int) -> None:
+        """
+        Queues `df` to be written to the worksheet at `sheet_index` on the next `publish`.
+        """
+        self.pending[sheet_index] = dataframe_to_grid(df)
+
+    def publish(self) -> int:
+        """
+        Writes all queued worksheet updates in one batch request and returns the number of ranges written.
+        """
+        data = []
+        for sheet_index, grid in self.pending.items():
+            wks = self.spreadsheet[sheet_index]
+            title = wks.title.replace("'", "''")
+
+            # Growing the worksheet if the new data does not fit
+            n_cols = max([len(row) for row in grid] or [0])
+            if wks.rows < len(grid):
+                wks.add_rows(len(grid) - wks.rows)
+            if wks.cols < n_cols:
+                wks.add_cols(n_cols - wks.cols)
+
+            for r0, r1, c0, c1, values in diff_grids(self.load_snapshot(sheet_index), grid):
+                data.append({
+                    'range': "'{}'!{}{}:{}{}".format(title, column_letter(c0 + 1), r0 + 1, column_letter(c1 + 1), r1 + 1),
+                    'majorDimension': 'ROWS',
+                    'values': values,
+                })
+
+        if data:
+            body = {'valueInputOption': 'USER_ENTERED', 'data': data}
+            start = time.perf_counter()
+            self.client.sheet.values_batch_update(self.spreadsheet.id, body)
+            instrumentation.record_request(
+                'https://sheets.googleapis.com/v4/spreadsheets/{}/values:batchUpdate'.format(self.spreadsheet.id),
+                'POST', 200, time.perf_counter() - start, bytes_sent=len(json.dumps(body).encode())
+            )
+
+        # Saving snapshots only once the batch went through
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        for sheet_index, grid in self.pending.items():
+            with open(self.snapshot_path(sheet_index), 'w') as f:
+                json.dump(grid, f)
+        self.pending = {}
+        return len(data)
+
+
+# Export dataframe to sheet if `to_sheet` is true
+def save_to_gsheet(df: pd.DataFrame, file_name: str, sheet_index: int):
+    #print(file_name)
 
-    # Update the sheet with the dataframe
-    wks.set_dataframe(df, (1, 1))
+    # Update the sheet with the dataframe (use a `SheetPublisher` directly to batch several sheets)
+    with SheetPublisher(file_name) as publisher:
+        publisher.update(df, sheet_index)
     
     # Upload to GitHub
-    '''upload_file_to_github(
+    '''from civis_aqueduct_utils.github import upload_file_to_github
+    upload_file_to_github(
         TOKEN,
         REPO,
         BRANCH,
@@ -0,0 +1,181 @@
+import os
+import time
+import pyarrow as pa
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import artifacts
+import instrumentation
+
+# Arrow IPC copies of the artifacts that every branch reads, memory-mapped by the workers
+SHARED_DIR = '../data/shared'
+SHARED_ARTIFACTS = ['all_naics_data', 'all_data', 'opp_naics']
+
+# Columns the NAICS branch reads from the shared artifacts
+NAICS_COLUMNS = [
+    'Opportunity__r.Id',
+    'Opportunity__r.Account.Name',
+    'Opportunity__r.Category__c',
+    'Opportunity_NAICS',
+    'NAICS_Code__r.NAICS_Description__c',
+    'Award_Amount__c',
+    'DBE__c',
+    'MBE__c',
+    'WBE__c',
+]
+OPP_NAICS_COLUMNS = [
+    'Opportunity__r.Id',
+    'Opportunity__r.Account.Name',
+    'Opportunity__r.Category__c',
+    'NAICS_Code__r.Name',
+    'NAICS_Code__r.NAICS_Description__c',
+]
+
+
+def share_artifacts(shared_dir: str = SHARED_DIR) -> None:
+    """
+    Writes uncompressed Arrow IPC copies of the shared artifacts so each worker can memory-map them
+    instead of re-reading and decoding the parquet datasets.
+    """
+    os.makedirs(shared_dir, exist_ok=True)
+    for name in SHARED_ARTIFACTS:
+        table = artifacts.read_artifact_table(name)
+        with pa.OSFile(os.path.join(shared_dir, name + '.arrow'), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def load_shared(name: str, columns: list = None, shared_dir: str = SHARED_DIR):
+    """
+    Memory-maps a shared artifact (read-only) and converts `columns` of it to a dataframe.
+    The memory map saves re-reading and decoding the parquet dataset, but the dataframe is a private
+    copy in each worker, so branches should only ask for the columns they use.
+    """
+    with pa.memory_map(os.path.join(shared_dir, name + '.arrow'), 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+# ## Branches (run in worker processes)
+
+def run_naics():
+    import naics_code_data_generation
+    instrumentation.start_run('naics_analysis')
+    naics_code_data_generation.analyze(
+        load_shared('all_naics_data', columns=NAICS_COLUMNS),
+        load_shared('opp_naics', columns=OPP_NAICS_COLUMNS)
+    )
+    instrumentation.write_report()
+
+
+def run_temporal():
+    import temporal
+    temporal.main(all_data=load_shared('all_data', columns=temporal.TEMPORAL_COLUMNS))
+
+
+def run_geocode():
+    import additional_naics_data_processing
+    additional_naics_data_processing.main(all_data=load_shared('all_data'))
+
+
+def run_geography_businesses():
+    import geography
+    instrumentation.start_run('geography_businesses')
+    result = geography.get_business_counts()
+    instrumentation.write_report()
+    return result
+
+
+def run_geography_publish(geography_businesses):
+    import geography
+    instrumentation.start_run('geography_publish')
+    zip_lists, business_counts = geography_businesses
+    awards = load_shared('all_data', columns=[
+        'Account__r.BillingStreet',
+        'Account__r.BillingPostalCode',
+        'Account__r.BillingCity',
+        'Account__r.BillingState',
+    ])
+    geography.publish_geography(zip_lists, business_counts, awards)
+    instrumentation.write_report()
+
+
+def run_disparity(geography_businesses=None, certified_counts=None):
+    import disparity
+    disparity.main(geography_businesses, certified_counts)
+
+
+def run_award_quantiles():
+    import sketches
+    sketches.main(all_data=load_shared('all_naics_data', columns=sketches.SKETCH_COLUMNS))
+
+
+# Branch name -> (function, branches it depends on). A branch receives its dependencies' results as
+# keyword arguments. `geography_publish` reads the NAICS analysis parquet written by `naics`.
+BRANCHES = {
+    'naics': (run_naics, []),
+    'temporal': (run_temporal, []),
+    'geocode': (run_geocode, []),
+    'geography_businesses': (run_geography_businesses, []),
+    'geography_publish': (run_geography_publish, ['geography_businesses', 'naics']),
+    'disparity': (run_disparity, ['geography_businesses']),
+    'award_quantiles': (run_award_quantiles, []),
+}
+
+
+def resolve_branches(branches: list = None) -> list:
+    """
+    Returns the given branches (all by default) plus every branch they depend on, in BRANCHES order.
+    Raises KeyError for unknown branches.
+    """
+    selected = set()
+    stack = list(branches or BRANCHES)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(BRANCHES[name][1])
+    return [name for name in BRANCHES if name in selected]
+
+
+def run_branches(branches: list = None, max_workers: int = None, options: dict = None) -> dict:
+    """
+    Runs the analysis branches that follow `all_data` concurrently in a process pool, starting each
+    branch as soon as its dependencies finish. Selecting a branch also runs the branches it depends on.
+    Network-bound branches (Socrata, ArcGIS, Sheets) overlap with the CPU-bound aggregations, so the
+    run takes about as long as the longest chain. `options` maps branch names to extra keyword
+    arguments for them (e.g. `{'disparity': {'certified_counts': path}}`); None values are left out.
+    Returns the seconds each branch took.
+    """
+    branches = resolve_branches(branches)
+    instrumentation.start_run('scheduler')
+
+    with instrumentation.stage('share_artifacts'):
+        share_artifacts()
+
+    results, seconds, started = {}, {}, {}
+    pending = {}
+    remaining = list(branches)
+    with ProcessPoolExecutor(max_workers=max_workers or len(branches)) as pool:
+        while remaining or pending:
+            # Submitting every branch whose dependencies are done
+            for name in list(remaining):
+                func, dependencies = BRANCHES[name]
+                if all(d in results for d in dependencies):
+                    kwargs = {d: results[d] for d in dependencies if results[d] is not None}
+                    kwargs.update({k: v for k, v in (options or {}).get(name, {}).items() if v is not None})
+                    started[name] = time.perf_counter()
+                    pending[pool.submit(func, **kwargs)] = name
+                    remaining.remove(name)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                results[name] = future.result()
+                seconds[name] = time.perf_counter() - started[name]
+                instrumentation.record_metric('{}_seconds'.format(name), seconds[name])
+                print("Finished branch {} in {:.1f} seconds.".format(name, seconds[name]))
+
+    instrumentation.write_report()
+    return seconds
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+import artifacts
+import instrumentation
+
+# Compression (delta) of the t-digests: about this many centroids per group, more of them in the tails
+COMPRESSION = 100
+
+# Base grain of the sketches: NAICS code x opportunity category x bid month, built separately for
+# every published NAICS level (0 for all codes) so an award listed under several codes is counted
+# once per code at that level, not once per 6-digit code
+SKETCH_LEVELS = [0, 2, 6]
+SKETCH_KEYS = ['naics', 'category', 'period']
+SKETCH_COLUMNS = [
+    'Contract_Award_ID__c', 'Opportunity__r.Id',
+    'Opportunity_NAICS', 'Opportunity__r.Category__c', 'bid_due_year_month', 'Award_Amount__c',
+]
+QUANTILES = [0.5, 0.9]
+
+# Centroids of every base sketch, and the published percentiles of the roll-ups
+SKETCH_FILE = '../data/award_amount_sketches.parquet'
+QUANTILE_FILE = '../data/award_amount_quantiles.parquet'
+
+
+def compress(groups: np.ndarray, means: np.ndarray, weights: np.ndarray, compression: int = COMPRESSION) -> tuple:
+    """
+    Compresses weighted points (raw values or centroids of other digests) into t-digest centroids for
+    every group at once. Points are sorted by group and value, and each one is assigned to a centroid
+    by the k1 scale function of its quantile within the group, k(q) = delta * (asin(2q - 1) / pi + 1/2),
+    so every centroid spans at most one unit of k. Returns the (group, mean, weight) of each centroid.
+    """
+    order = np.lexsort((means, groups))
+    groups, means, weights = groups[order], means[order], weights[order]
+
+    totals = np.bincount(groups, weights=weights)
+    group_offsets = np.cumsum(totals) - totals
+    before = np.cumsum(weights) - weights - group_offsets[groups]
+    q = np.clip((before + weights / 2) / totals[groups], 0, 1)
+    cluster = np.floor(compression * (np.arcsin(2 * q - 1) / np.pi + 0.5)).astype('int64')
+
+    cells, centroid = np.unique(groups * (compression + 1) + cluster, return_inverse=True)
+    centroid_weights = np.bincount(centroid, weights=weights)
+    centroid_means = np.bincount(centroid, weights=weights * means) / centroid_weights
+    return cells // (compression + 1), centroid_means, centroid_weights
+
+
+def compress_groups(df: pd.DataFrame, keys: list, means, weights, mins, maxs, compression: int = COMPRESSION) -> pd.DataFrame:
+    """
+    Groups the points of `df` by `keys` and returns one row per centroid: the keys, the centroid
+    `mean` and `weight`, and the group's exact `min` and `max`.
+    """
+    groups = df.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    _, first = np.unique(groups, return_index=True)
+    key_values = df[keys].iloc[first].reset_index(drop=True)
+
+    group_mins = np.full(len(first), np.inf)
+    group_maxs = np.full(len(first), -np.inf)
+    np.minimum.at(group_mins, groups, np.asarray(mins, dtype='float64'))
+    np.maximum.at(group_maxs, groups, np.asarray(maxs, dtype='float64'))
+
+    centroid_groups, centroid_means, centroid_weights = compress(
+        groups, np.asarray(means, dtype='float64'), np.asarray(weights, dtype='float64'), compression
+    )
+    sketches = key_values.iloc[centroid_groups].reset_index(drop=True)
+    sketches['mean'] = centroid_means
+    sketches['weight'] = centroid_weights
+    sketches['min'] = group_mins[centroid_groups]
+    sketches['max'] = group_maxs[centroid_groups]
+    return sketches
+
+
+def build_sketches(all_data: pd.DataFrame, naics_levels: list = SKETCH_LEVELS, compression: int = COMPRESSION) -> pd.DataFrame:
+    """
+    Builds the award amount t-digest of every NAICS code x category x bid month at each of
+    `naics_levels` in one pass over the award x NAICS rows, keeping one row per award and code at each level.
+    """
+    award = all_data.groupby(['Contract_Award_ID__c', 'Opportunity__r.Id'], sort=False, dropna=False).ngroup()
+    naics = all_data['Opportunity_NAICS'].astype(str)
+    data = pd.concat([
+        pd.DataFrame({
+            'naics_level': naics_level,
+            'award': award,
+            'naics': naics.str[:naics_level] if naics_level else 'All',
+            'category': all_data['Opportunity__r.Category__c'].fillna('None'),
+            'period': all_data['bid_due_year_month'].fillna('None'),
+            'amount': pd.to_numeric(all_data['Award_Amount__c'], errors='coerce'),
+        }).drop_duplicates(subset=['award', 'naics'])
+        for naics_level in naics_levels
+    ], ignore_index=True).dropna(subset=['amount'])
+    amounts = data['amount'].to_numpy()
+    return compress_groups(data, ['naics_level'] + SKETCH_KEYS, amounts, np.ones(len(data)), amounts, amounts, compression)
+
+
+def merge_sketches(sketches: pd.DataFrame, keys: list = SKETCH_KEYS, compression: int = COMPRESSION) -> pd.DataFrame:
+    """
+    Merges the sketches that share the same `keys` values by re-compressing their centroids.
+    """
+    return compress_groups(sketches, keys, sketches['mean'], sketches['weight'], sketches['min'], sketches['max'], compression)
+
+
+def rollup(sketches: pd.DataFrame, naics_level: int = 6, period: str = 'month', by_category: bool = True) -> pd.DataFrame:
+    """
+    Rolls the base sketches of `naics_level` (None or 0 for all codes) up to a coarser grain:
+    bid months to years (`period='year'`) and/or all categories combined. No sketches (no awards)
+    roll up to no sketches.
+    """
+    naics_level = naics_level or 0
+    if len(sketches) and naics_level not in sketches['naics_level'].unique():
+        raise ValueError('No base sketches at NAICS level {}'.format(naics_level))
+    sketches = sketches[sketches['naics_level'] == naics_level].drop(columns='naics_level')
+    sketches = sketches.assign(
+        period=sketches['period'].str[:4] if period == 'year' else sketches['period'],
+        category=sketches['category'] if by_category else 'All',
+    )
+    return merge_sketches(sketches)
+
+
+def get_quantiles(sketches: pd.DataFrame, quantiles: list = QUANTILES, keys: list = SKETCH_KEYS) -> pd.DataFrame:
+    """
+    Estimates the given quantiles of every sketch by interpolating between its centroids
+    (placed at their cumulative-weight midpoints), the group min (at 0) and the group max (at 1).
+    Returns one row per group: the keys, the number of awards, min, max and `p50`, `p90`, ... columns.
+    """
+    groups = sketches.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    order = np.lexsort((sketches['mean'].to_numpy(), groups))
+    groups = groups[order]
+    means = sketches['mean'].to_numpy()[order]
+    weights = sketches['weight'].to_numpy()[order]
+    n_groups = groups.max() + 1 if len(groups) else 0
+
+    totals = np.bincount(groups, weights=weights, minlength=n_groups)
+    group_offsets = np.cumsum(totals) - totals
+    positions = (np.cumsum(weights) - weights / 2 - group_offsets[groups]) / totals[groups]
+    _, first = np.unique(groups, return_index=True)
+    mins = sketches['min'].to_numpy()[order][first]
+    maxs = sketches['max'].to_numpy()[order][first]
+
+    # Adding the min and max as endpoints and searching every group at once on `2 * group + position`
+    point_groups = np.concatenate([np.arange(n_groups), groups, np.arange(n_groups)])
+    point_positions = np.concatenate([np.zeros(n_groups), positions, np.ones(n_groups)])
+    point_values = np.concatenate([mins, means, maxs])
+    point_order = np.lexsort((point_positions, point_groups))
+    point_keys = (2 * point_groups + point_positions)[point_order]
+    point_positions, point_values = point_positions[point_order], point_values[point_order]
+    group_starts = np.searchsorted(point_keys, 2 * np.arange(n_groups))
+
+    result = sketches[keys].iloc[order[first]].reset_index(drop=True)
+    result['awards'] = totals.round().astype('int64')
+    result['min'] = mins
+    result['max'] = maxs
+    for quantile in quantiles:
+        right = np.maximum(np.searchsorted(point_keys, 2 * np.arange(n_groups) + quantile), group_starts + 1)
+        left = right - 1
+        span = point_positions[right] - point_positions[left]
+        fraction = np.divide(quantile - point_positions[left], span, out=np.zeros(n_groups), where=span > 0)
+        result['p{:g}'.format(quantile * 100)] = point_values[left] + fraction * (point_values[right] - point_values[left])
+    return result
+
+
+def get_published_quantiles(sketches: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the award amount percentiles of every published roll-up: 2- and 6-digit NAICS codes,
+    by month and by year, per category and across categories.
+    """
+    rollups = []
+    for naics_level in [2, 6]:
+        for period in ['month', 'year']:
+            for by_category in [True, False]:
+                quantiles = get_quantiles(rollup(sketches, naics_level, period, by_category))
+                quantiles.insert(0, 'naics_level', naics_level)
+                quantiles.insert(1, 'period_type', period)
+                rollups.append(quantiles)
+    return pd.concat(rollups, ignore_index=True)
+
+
+def main(all_data: pd.DataFrame = None):
+    instrumentation.start_run('award_quantiles')
+
+    with instrumentation.stage('read_all_naics_data') as stage:
+        if all_data is None:
+            all_data = artifacts.read_artifact('all_naics_data', columns=SKETCH_COLUMNS)
+        stage['rows_out'] = len(all_data)
+    with instrumentation.stage('build_sketches', rows_in=len(all_data)) as stage, instrumentation.profiled('build_sketches'):
+        sketches = build_sketches(all_data)
+        stage['rows_out'] = len(sketches)
+    sketches.to_parquet(SKETCH_FILE, index=False)
+
+    with instrumentation.stage('get_published_quantiles', rows_in=len(sketches)) as stage:
+        quantiles = get_published_quantiles(sketches)
+        stage['rows_out'] = len(quantiles)
+    quantiles.to_parquet(QUANTILE_FILE, index=False)
+
+    instrumentation.write_report()
+    return quantiles
+
+
+if __name__ == "__main__":
+    main()
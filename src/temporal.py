@@ -1,11 +1,32 @@
 import pandas as pd
 import save_files
+import artifacts
+import instrumentation
 
-# Read in generated data from previous notebook
-all_data = pd.read_csv("../data/all_data.csv")
-print(list(all_data.columns))
+TEMPORAL_COLUMNS = ["DBE__c", "MBE__c", "WBE__c", "Award_Amount__c", "bid_due_year", "bid_due_year_month"]
 
-def get_percents(timeframes: list, timeframe_column: str = "bid_due_year"):
+PERCENTS_BY_YEAR_FILE = '../data/percents_by_year{}.parquet'
+PERCENTS_BY_MONTH_FILE = '../data/percents_by_month{}.parquet'
+
+
+def get_output_path(path: str, years: list = None) -> str:
+    """
+    Returns the output file of a run: the published file for the full history, otherwise a file
+    named after the analyzed years (e.g. `percents_by_year_2019_2020.parquet`).
+    """
+    return path.format(''.join('_{}'.format(year) for year in sorted(years or [])))
+
+
+def load_all_data(years: list = None) -> pd.DataFrame:
+    """
+    Reads the columns needed for the temporal analysis from the `all_data` artifact.
+    If `years` is given, only those bid year partitions are read.
+    """
+    filters = [("bid_due_year", "in", list(years))] if years else None
+    return artifacts.read_artifact("all_data", columns=TEMPORAL_COLUMNS, filters=filters)
+
+
+def get_percents(all_data: pd.DataFrame, timeframes: list, timeframe_column: str = "bid_due_year"):
     """
     Returns the % of contracts and % of dollars awarded to DBE, MBE, WBEs
     """
@@ -49,23 +70,47 @@ def get_percents(timeframes: list, timeframe_column: str = "bid_due_year"):
     return df
 
 
-def main():
+def main(years: list = None, all_data: pd.DataFrame = None, client=None):
+    """
+    Runs the temporal analysis. A run limited to some `years` writes files named after them and
+    doesn't publish to the Google Sheet, whose tabs hold the full history.
+    """
+    instrumentation.start_run('temporal')
+
+    # Read in generated data from previous notebook (only the given bid years, if any) unless passed in
+    with instrumentation.stage('load_all_data') as stage:
+        if all_data is None:
+            all_data = load_all_data(years)
+        stage['rows_out'] = len(all_data)
+    print(list(all_data.columns))
+
+    publisher = None if years else save_files.SheetPublisher("Procurement Data New", client=client)
+
     # Generate google sheet for yearly analysis
-    years = sorted(all_data.bid_due_year.unique())
-    percents_by_year = get_percents(years, "bid_due_year")
+    with instrumentation.stage('percents_by_year', rows_in=len(all_data)) as stage, instrumentation.profiled('percents_by_year'):
+        bid_years = sorted(all_data.bid_due_year.unique())
+        percents_by_year = get_percents(all_data, bid_years, "bid_due_year")
+        stage['rows_out'] = len(percents_by_year)
     print(percents_by_year)
-
-    # write to google sheet
-    save_files.save_to_gsheet(percents_by_year, "Procurement Data New", 3)
+    percents_by_year.to_parquet(get_output_path(PERCENTS_BY_YEAR_FILE, years), index=False)
 
 
     # Generate google sheet for monthly analysis
-    months = sorted(all_data.bid_due_year_month.unique())
-    percents_by_month = get_percents(months, "bid_due_year_month")
+    with instrumentation.stage('percents_by_month', rows_in=len(all_data)) as stage, instrumentation.profiled('percents_by_month'):
+        months = sorted(all_data.bid_due_year_month.unique())
+        percents_by_month = get_percents(all_data, months, "bid_due_year_month")
+        stage['rows_out'] = len(percents_by_month)
     print(percents_by_month)
+    percents_by_month.to_parquet(get_output_path(PERCENTS_BY_MONTH_FILE, years), index=False)
+
+    # write both tabs to the google sheet in one batch request
+    if publisher is not None:
+        publisher.update(percents_by_year, 3)
+        publisher.update(percents_by_month, 4)
+        with instrumentation.stage('publish_gsheet'):
+            publisher.publish()
 
-    # write to google sheet
-    save_files.save_to_gsheet(percents_by_month, "Procurement Data new", 4)
+    instrumentation.write_report()
 
 
 if __name__ == "__main__":
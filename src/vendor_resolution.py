@@ -0,0 +1,197 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from local_geocoder import normalize_zip, get_trigrams
+
+# Award columns identifying a vendor record (one record per distinct name + billing address)
+VENDOR_COLUMNS = ['Account__r.Name', 'Account__r.BillingStreet', 'Account__r.BillingPostalCode']
+
+# Words dropped from vendor names before comparing them
+LEGAL_SUFFIXES = [
+    'INC', 'INCORPORATED', 'LLC', 'LLP', 'LP', 'LTD', 'LIMITED', 'CORP', 'CORPORATION',
+    'CO', 'COMPANY', 'PC', 'PLLC', 'THE', 'DBA',
+]
+
+# Blocks with more records than this (e.g. a very common name token) are too unspecific to compare
+MAX_BLOCK_SIZE = 200
+
+# Name trigram (Jaccard) similarity at which two records match on their names alone, and the lower
+# similarity at which they match when the ZIP code and house number confirm it.
+# Names whose numbers differ (e.g. VENDOR 107 and VENDOR 1071) never match.
+NAME_MATCH_THRESHOLD = 0.9
+ADDRESS_MATCH_THRESHOLD = 0.8
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'), **dict.fromkeys('DT', '3'),
+    'L': '4', **dict.fromkeys('MN', '5'), 'R': '6',
+}
+
+
+def normalize_vendor_name(name: pd.Series) -> pd.Series:
+    """
+    Canonicalizes vendor names: uppercase, '&' spelled out, punctuation and legal suffixes removed.
+    """
+    suffix_pattern = r'\b(?:{})\b'.format('|'.join(LEGAL_SUFFIXES))
+    return (
+        name
+        .fillna('')
+        .astype(str)
+        .str.upper()
+        .str.replace('&', ' AND ', regex=False)
+        .str.replace(r'[.\']', '', regex=True)
+        .str.replace(r'[^A-Z0-9 ]', ' ', regex=True)
+        .str.replace(suffix_pattern, ' ', regex=True)
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+    )
+
+
+def soundex(word: str) -> str:
+    """
+    Returns the 4-character Soundex code of a word ('' for words without letters).
+    """
+    letters = [c for c in word.upper() if c.isalpha()]
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, '')
+        if digit and digit != previous:
+            code += digit
+        if c not in 'HW':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def get_vendor_records(awards: pd.DataFrame) -> tuple:
+    """
+    Returns the distinct vendor records (normalized name, ZIP code and house number) and each award's record index.
+    """
+    keys = awards[VENDOR_COLUMNS].fillna('').astype(str)
+    record_index = keys.groupby(VENDOR_COLUMNS, sort=False).ngroup().to_numpy()
+    keys = keys.drop_duplicates().reset_index(drop=True)
+    records = pd.DataFrame({
+        'name': normalize_vendor_name(keys['Account__r.Name']),
+        'zip': normalize_zip(keys['Account__r.BillingPostalCode']),
+        'number': keys['Account__r.BillingStreet'].str.extract(r'^\s*(\d+)', expand=False),
+    })
+    return records, record_index
+
+
+def get_blocking_keys(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns (record, key) rows for the blocking keys: every name token, the phonetic code of the
+    first two name tokens, and the ZIP code with the phonetic code of the first token.
+    """
+    records = records[records['name'] != '']
+    tokens = records['name'].str.split()
+    phonetic = tokens.map(lambda t: [soundex(w) for w in t[:2]])
+    keys = pd.concat([
+        tokens.explode().dropna().map('n:{}'.format),
+        phonetic.map(lambda p: 'p:' + ''.join(p) if p else None).dropna(),
+        ('z:' + records['zip'] + ':' + phonetic.map(lambda p: p[0] if p else '')).dropna(),
+    ])
+    return pd.DataFrame({'record': keys.index.to_numpy(), 'key': keys.to_numpy()}).drop_duplicates()
+
+
+def get_candidate_pairs(keys: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the distinct (i, j) record pairs, i < j, sharing at least one block of at most MAX_BLOCK_SIZE records.
+    """
+    sizes = keys['key'].map(keys['key'].value_counts())
+    keys = keys[(sizes > 1) & (sizes <= MAX_BLOCK_SIZE)]
+    pairs = keys.merge(keys, on='key', suffixes=('_i', '_j'))
+    pairs = pairs[pairs['record_i'] < pairs['record_j']]
+    return (
+        pairs[['record_i', 'record_j']]
+        .drop_duplicates()
+        .rename(columns={'record_i': 'i', 'record_j': 'j'})
+        .reset_index(drop=True)
+    )
+
+
+def score_pairs(records: pd.DataFrame, pairs: pd.DataFrame) -> np.ndarray:
+    """
+    Scores every candidate pair at once: trigram Jaccard similarity of the names (shared trigrams
+    counted with a join over the trigram postings), or 0 for names with different numbers.
+    """
+    trigrams = records['name'].map(lambda s: sorted(get_trigrams(s))).explode()
+    trigrams = pd.DataFrame({'record': trigrams.index.to_numpy(), 'trigram': pd.factorize(trigrams)[0]})
+    n_trigrams = np.bincount(trigrams['record'], minlength=len(records))
+
+    shared = (
+        pairs.reset_index().rename(columns={'index': 'pair'})
+        .merge(trigrams.rename(columns={'record': 'i'}), on='i')
+        .merge(trigrams.rename(columns={'record': 'j'}), on=['j', 'trigram'])
+    )
+    i, j = pairs['i'].to_numpy(), pairs['j'].to_numpy()
+    intersection = np.bincount(shared['pair'], minlength=len(pairs))
+    name_similarity = intersection / (n_trigrams[i] + n_trigrams[j] - intersection)
+
+    numbers = records['name'].str.findall(r'\d+').str.join(' ').to_numpy()
+    return np.where(numbers[i] == numbers[j], name_similarity, 0.0)
+
+
+def match_pairs(records: pd.DataFrame, pairs: pd.DataFrame) -> np.ndarray:
+    """
+    Returns which candidate pairs are the same vendor: names similar enough on their own, or nearly
+    as similar at the same ZIP code and house number. The address only confirms a close name match.
+    """
+    name_similarity = score_pairs(records, pairs)
+    i, j = pairs['i'].to_numpy(), pairs['j'].to_numpy()
+    zips, numbers = records['zip'].to_numpy(), records['number'].to_numpy()
+    same_address = (
+        records['zip'].notnull().to_numpy()[i] & (zips[i] == zips[j])
+        & records['number'].notnull().to_numpy()[i] & (numbers[i] == numbers[j])
+    )
+    return (name_similarity >= NAME_MATCH_THRESHOLD) | (same_address & (name_similarity >= ADDRESS_MATCH_THRESHOLD))
+
+
+def find_clusters(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    Union-find over the matched pairs. Returns the root (lowest member) of each element's cluster.
+    """
+    parent = np.arange(n)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(left, right):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    return np.array([find(x) for x in range(n)], dtype='int64')
+
+
+def resolve_vendors(awards: pd.DataFrame) -> pd.Series:
+    """
+    Clusters the vendor records of the awards and returns each award's `vendor_id`.
+    The id hashes the smallest (normalized name, ZIP code) in the cluster, so it doesn't depend on
+    row order and stays the same across runs unless that member's cluster changes.
+    """
+    records, record_index = get_vendor_records(awards)
+    pairs = get_candidate_pairs(get_blocking_keys(records))
+    matched = pairs[match_pairs(records, pairs)]
+    clusters = find_clusters(len(records), matched['i'].to_numpy(), matched['j'].to_numpy())
+
+    member_keys = records['name'] + '|' + records['zip'].fillna('')
+    cluster_keys = member_keys.groupby(clusters).transform('min')
+    vendor_ids = cluster_keys.map(lambda key: 'V' + hashlib.sha1(key.encode()).hexdigest()[:12]).to_numpy()
+
+    instrumentation.record_metric('vendor_records', len(records))
+    instrumentation.record_metric('candidate_pairs', len(pairs))
+    instrumentation.record_metric('vendors', len(np.unique(clusters)))
+    return pd.Series(vendor_ids[record_index], index=awards.index, name='vendor_id')
+
+
+def add_vendor_ids(awards: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the awards with a `vendor_id` column.
+    """
+    return awards.assign(vendor_id=resolve_vendors(awards))
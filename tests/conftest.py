@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The pipeline scripts in `src/` are top-level modules (see setup.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -0,0 +1,95 @@
+"""
+Local stand-in for the pygsheets client used by `save_files.SheetPublisher`.
+Worksheets hold their cells in memory and `sheet.values_batch_update` applies A1 ranges to them.
+"""
+import re
+
+RANGE_PATTERN = re.compile(r"^'((?:[^']|'')*)'!([A-Z]+)(\d+):([A-Z]+)(\d+)$")
+
+
+def column_number(letters: str) -> int:
+    """
+    Converts A1-notation column letters into a 1-based column number ('A' -> 1, 'AA' -> 27).
+    """
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+class FakeWorksheet:
+    def __init__(self, title: str, rows: int = 1000, cols: int = 26):
+        self.title = title
+        self.rows = rows
+        self.cols = cols
+        self.cells = {}
+
+    def add_rows(self, n: int) -> None:
+        self.rows += n
+
+    def add_cols(self, n: int) -> None:
+        self.cols += n
+
+    def get_grid(self) -> list:
+        """
+        Returns the non-empty part of the worksheet as a list of rows (trailing empty cells and rows trimmed).
+        """
+        cells = {key: value for key, value in self.cells.items() if value != ''}
+        if not cells:
+            return []
+        n_rows = max(r for r, _ in cells) + 1
+        grid = []
+        for r in range(n_rows):
+            n_cols = max([c + 1 for rr, c in cells if rr == r] or [0])
+            grid.append([cells.get((r, c), '') for c in range(n_cols)])
+        return grid
+
+
+class FakeSpreadsheet:
+    def __init__(self, spreadsheet_id: str, worksheets: list):
+        self.id = spreadsheet_id
+        self.worksheets = worksheets
+
+    def __getitem__(self, index: int) -> FakeWorksheet:
+        return self.worksheets[index]
+
+
+class FakeSheetsApi:
+    def __init__(self, client):
+        self.client = client
+        self.requests = []
+
+    def values_batch_update(self, spreadsheet_id: str, body: dict) -> None:
+        self.requests.append(body)
+        spreadsheet = self.client.spreadsheets_by_id[spreadsheet_id]
+        for update in body['data']:
+            title, c0, r0, c1, r1 = RANGE_PATTERN.match(update['range']).groups()
+            worksheet = next(w for w in spreadsheet.worksheets if w.title == title.replace("''", "'"))
+            r0, r1, c0, c1 = int(r0) - 1, int(r1) - 1, column_number(c0) - 1, column_number(c1) - 1
+            assert len(update['values']) == r1 - r0 + 1
+            for i, row in enumerate(update['values']):
+                assert len(row) == c1 - c0 + 1
+                for j, value in enumerate(row):
+                    worksheet.cells[(r0 + i, c0 + j)] = value
+
+
+class FakeSheetsClient:
+    """
+    Exposes `open()` and `sheet.values_batch_update()` like an authorized pygsheets client.
+    """
+
+    def __init__(self, n_worksheets: int = 8):
+        self.spreadsheets = {}
+        self.spreadsheets_by_id = {}
+        self.n_worksheets = n_worksheets
+        self.sheet = FakeSheetsApi(self)
+
+    def open(self, file_name: str) -> FakeSpreadsheet:
+        if file_name not in self.spreadsheets:
+            spreadsheet = FakeSpreadsheet(
+                'id-{}'.format(len(self.spreadsheets)),
+                [FakeWorksheet("Sheet{}'s".format(i), rows=5, cols=3) for i in range(self.n_worksheets)]
+            )
+            self.spreadsheets[file_name] = spreadsheet
+            self.spreadsheets_by_id[spreadsheet.id] = spreadsheet
+        return self.spreadsheets[file_name]
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+import bootstrap
+
+
+def make_data(n: int = 400, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'naics': rng.choice(['236220', '238210', '541330'], n),
+        'amount': rng.lognormal(10, 1, n),
+        'DBE__c': rng.random(n) < 0.3,
+        'MBE__c': rng.random(n) < 0.1,
+    })
+
+
+def get_intervals(data, **kwargs):
+    kwargs = {'n_resamples': 400, 'chunk_size': 100, 'max_workers': 2, **kwargs}
+    return bootstrap.bootstrap_shares(data['naics'], data['amount'], data[['DBE__c', 'MBE__c']], **kwargs)
+
+
+def test_fixed_seed_intervals():
+    data = make_data()
+    intervals = get_intervals(data)
+    assert intervals.index.tolist() == ['236220', '238210', '541330']
+    assert intervals.columns.tolist() == [
+        'DBE__c dollars low', 'DBE__c dollars high', 'DBE__c contracts low', 'DBE__c contracts high',
+        'MBE__c dollars low', 'MBE__c dollars high', 'MBE__c contracts low', 'MBE__c contracts high',
+    ]
+
+    # The same seed gives the same intervals, whatever the number of workers
+    pd.testing.assert_frame_equal(intervals, get_intervals(data, max_workers=1))
+    assert not intervals.equals(get_intervals(data, seed=1))
+
+    # The intervals bracket the observed shares
+    for naics, group in data.groupby('naics'):
+        contracts = 100 * group['DBE__c'].mean()
+        dollars = 100 * group.loc[group['DBE__c'], 'amount'].sum() / group['amount'].sum()
+        row = intervals.loc[naics]
+        assert row['DBE__c contracts low'] < contracts < row['DBE__c contracts high']
+        assert row['DBE__c dollars low'] < dollars < row['DBE__c dollars high']
+        assert row['DBE__c contracts high'] - row['DBE__c contracts low'] < 25
+
+
+def test_rows_without_a_group_are_left_out():
+    data = make_data()
+    with_missing = pd.concat([data, data.head(50).assign(naics=np.nan)], ignore_index=True)
+    pd.testing.assert_frame_equal(get_intervals(with_missing), get_intervals(data), check_index_type=False)
+
+
+def test_empty_input():
+    intervals = get_intervals(make_data().head(0))
+    assert intervals.empty
+    assert len(intervals.columns) == 8
+
+    intervals = get_intervals(make_data().assign(naics=np.nan))
+    assert intervals.empty
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import disparity
+
+ZIP_LISTS = (['90012'], ['91101'], ['pasadena'])
+
+
+def make_awards():
+    # Three city vendors in NAICS 236220 in FY 2021, one of them a DBE, plus a county award
+    return pd.DataFrame({
+        'Contract_Award_ID__c': ['A1', 'A2', 'A3', 'A4'],
+        'Opportunity__r.Id': ['O1', 'O2', 'O3', 'O4'],
+        'Account__r.Name': ['Acme', 'Bolt', 'Crane', 'Dunn'],
+        'Account__r.BillingPostalCode': ['90012', '90012', '90012', '91101'],
+        'Account__r.BillingCity': ['Los Angeles', 'Los Angeles', 'Los Angeles', 'Pasadena'],
+        'Award_Amount__c': [100.0, 200.0, 700.0, 50.0],
+        'Opportunity__r.Bid_Due__c': ['2020-08-01'] * 4,
+        'Opportunity_NAICS': ['236220', '236220', '236220', '238210'],
+        'DBE__c': [True, False, False, False],
+        'MBE__c': [False, False, False, False],
+        'WBE__c': [False, False, False, False],
+    })
+
+
+def make_business_counts():
+    # A large business listing: it must not enter the availability
+    return (
+        pd.DataFrame({'NAICS': ['236220'], 'city_biz_count': [5000]}),
+        pd.DataFrame({'NAICS': ['238210'], 'county_biz_count': [900]}),
+        pd.DataFrame({'NAICS': pd.Series([], dtype=str), 'other_biz_count': pd.Series([], dtype='int64')}),
+    )
+
+
+def get_cell(result, naics, region, group):
+    cell = result[(result['naics'] == naics) & (result['region'] == region) & (result['group'] == group)]
+    assert len(cell) == 1
+    return cell.iloc[0]
+
+
+def test_vendor_share_uses_awarded_vendors():
+    result = disparity.compute_disparity(make_awards(), ZIP_LISTS, make_business_counts(), levels=[6])
+    cell = get_cell(result, '236220', 'city', 'DBE')
+    assert cell['vendors'] == 3
+    assert cell['group_vendors'] == 1
+    assert cell['registry_firms'] == 5000
+    assert cell['utilization'] == 0.1
+    assert np.isclose(cell['vendor_share'], 1 / 3)
+    assert np.isclose(cell['vendor_disparity_index'], 30)
+    assert result['vendor_share'].dropna().between(0, 1).all()
+
+
+def test_no_certified_counts_leaves_availability_missing():
+    result = disparity.compute_disparity(make_awards(), ZIP_LISTS, make_business_counts(), levels=[6])
+    assert result['certified_firms'].isnull().all()
+    assert result['availability'].isnull().all()
+    assert result['disparity_index'].isnull().all()
+
+
+def test_no_group_vendors_leaves_vendor_disparity_missing():
+    result = disparity.compute_disparity(make_awards(), ZIP_LISTS, make_business_counts(), levels=[6])
+    cell = get_cell(result, '238210', 'county', 'DBE')
+    assert cell['vendor_share'] == 0
+    assert np.isnan(cell['vendor_disparity_index'])
+
+
+def make_certified_counts():
+    return pd.DataFrame({
+        'NAICS': ['236220', '236220'],
+        'region': ['city', 'county'],
+        'firms': [40, 10],
+        'DBE': [10, 5],
+        'MBE': [0, 0],
+        'WBE': [4, 1],
+    })
+
+
+def test_certified_counts_give_availability():
+    result = disparity.compute_disparity(
+        make_awards(), ZIP_LISTS, make_business_counts(), levels=[2], certified_counts=make_certified_counts()
+    )
+    city = get_cell(result, '23', 'city', 'DBE')
+    assert city['availability'] == 0.25
+    assert np.isclose(city['disparity_index'], 40)
+    assert get_cell(result, '23', 'all', 'DBE')['availability'] == 0.3
+    assert np.isnan(get_cell(result, '23', 'city', 'MBE')['disparity_index'])
+    # The awarded-vendor proxy is unchanged
+    assert np.isclose(city['vendor_share'], 1 / 3)
+
+
+def test_read_certified_counts(tmp_path):
+    path = str(tmp_path / 'certified.csv')
+    make_certified_counts().to_csv(path, index=False)
+    counts = disparity.read_certified_counts(path)
+    assert counts['NAICS'].tolist() == ['236220', '236220']
+
+    make_certified_counts().drop(columns='WBE').to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        disparity.read_certified_counts(path)
@@ -0,0 +1,26 @@
+import pandas as pd
+
+import geography
+
+
+def make_awards(extra_columns: int = 0):
+    awards = pd.DataFrame({
+        'Account__r.BillingStreet': ['1 Main St', '2 Main St', '3 Oak St', '4 Pine St', '5 Elm St'],
+        'Account__r.BillingPostalCode': ['90012', '90012', '91101', '94103', '10001'],
+        'Account__r.BillingCity': ['Los Angeles', 'Los Angeles', 'Pasadena', 'San Francisco', 'New York'],
+        'Account__r.BillingState': ['CA', 'CA', 'CA', 'CA', 'NY'],
+    })
+    for i in range(extra_columns):
+        awards['extra_{}'.format(i)] = i
+    return awards
+
+
+def test_count_awards_by_location_counts_rows():
+    expected = {'awards_in_city': 2, 'awards_in_county': 1, 'awards_in_state': 1, 'awards_out_of_state': 1}
+    # The tally doesn't depend on how many columns were read
+    for extra_columns in [0, 7]:
+        by_location = geography.get_awards_by_location(
+            ['90012'], ['91101'], ['pasadena'], awards=make_awards(extra_columns)
+        )
+        counts = geography.count_awards_by_location(*by_location)
+        assert counts.iloc[0].to_dict() == expected
@@ -0,0 +1,126 @@
+import json
+
+import pandas as pd
+import pytest
+
+import additional_naics_data_processing as processing
+import local_geocoder
+
+# County address points export: two streets in 90012 and one street that only exists in 91101
+ADDRESS_POINTS = pd.DataFrame({
+    'Number': ['200', '201', '100', '300'],
+    'PreDirAbbr': ['N', 'N', '', ''],
+    'StreetName': ['SPRING', 'SPRING', 'TEMPLE', 'COLORADO'],
+    'PostType': ['ST', 'ST', 'ST', 'BLVD'],
+    'PostDir': ['', '', '', ''],
+    'ZipCode': ['90012', '90012', '90012', '91101'],
+    'LAT': ['34.0537', '34.0538', '34.0560', '34.1456'],
+    'LON': ['-118.2427', '-118.2428', '-118.2400', '-118.1500'],
+})
+
+
+@pytest.fixture
+def address_index(tmp_path):
+    source = str(tmp_path / 'address_points.csv')
+    ADDRESS_POINTS.to_csv(source, index=False)
+    return local_geocoder.load_address_index(source, str(tmp_path / 'index'))
+
+
+def make_reduced(addresses: list) -> pd.DataFrame:
+    return pd.DataFrame({
+        'OBJECTID': range(len(addresses)),
+        'Address': [address for address, _ in addresses],
+        'City': 'Los Angeles',
+        'Region': 'CA',
+        'Postal': [zip_code for _, zip_code in addresses],
+    })
+
+
+def test_normalization():
+    parts = local_geocoder.split_street_address(pd.Series(['200 North Spring Street Suite 5', 'PO Box 12']))
+    assert parts['number'].tolist()[0] == '200'
+    assert parts['street'].tolist()[0] == 'N SPRING ST'
+    assert parts['number'].isnull().tolist() == [False, True]
+    assert local_geocoder.normalize_zip(pd.Series(['90012-1234', '90012.0', 'n/a'])).tolist()[:2] == ['90012', '90012']
+
+
+def test_exact_match(address_index):
+    locations, unresolved = local_geocoder.geocode_addresses(make_reduced([('200 N Spring St', '90012')]), address_index)
+    assert unresolved.empty
+    assert locations[0]['attributes']['ResultID'] == 0
+    assert locations[0]['score'] == 100
+    assert locations[0]['location'] == {'x': -118.2427, 'y': 34.0537}
+
+
+def test_fuzzy_match(address_index):
+    locations, unresolved = local_geocoder.geocode_addresses(
+        make_reduced([('201 North Sprng Street #4', '90012-1234')]), address_index
+    )
+    assert unresolved.empty
+    assert locations[0]['location'] == {'x': -118.2428, 'y': 34.0538}
+    assert 50 <= locations[0]['score'] < 100
+
+    assert local_geocoder.match_street('N SPRNG ST', '90012', address_index)[0] == 'N SPRING ST'
+    assert local_geocoder.match_street('MAIN ST', '90012', address_index) == (None, 0)
+
+
+def test_wrong_zip_is_rejected(address_index):
+    # COLORADO BLVD is only indexed under 91101; the fuzzy lookup must not reach other ZIP codes
+    assert local_geocoder.match_street('COLORADO BLVD', '90012', address_index) == (None, 0)
+    locations, unresolved = local_geocoder.geocode_addresses(
+        make_reduced([('300 Colorado Blvd', '90012'), ('200 N Spring St', '91101')]), address_index
+    )
+    assert locations == []
+    assert unresolved['OBJECTID'].tolist() == [0, 1]
+
+
+def test_no_index_resolves_nothing(tmp_path):
+    assert local_geocoder.load_address_index(str(tmp_path / 'missing.csv'), str(tmp_path / 'index')) is None
+    reduced = make_reduced([('200 N Spring St', '90012')])
+    locations, unresolved = local_geocoder.geocode_addresses(reduced, None)
+    assert locations == []
+    pd.testing.assert_frame_equal(unresolved, reduced)
+
+
+def test_arcgis_receives_only_unresolved_rows(address_index, monkeypatch):
+    all_data = pd.DataFrame({
+        'Account__r.BillingStreet': ['200 N Spring St', '1 World Way', '200 N Spring St', '100 Temple Street'],
+        'Account__r.BillingCity': ['Los Angeles'] * 4,
+        'Account__r.BillingState': ['CA'] * 4,
+        'Account__r.BillingPostalCode': ['90012', '90045', '90012', '90012'],
+    })
+    all_data, reduced, spatial_data = processing.format_data(all_data)
+    local_locations, spatial_data = processing.geocode_locally(reduced, spatial_data, address_index)
+    assert sorted(location['attributes']['ResultID'] for location in local_locations) == [0, 2]
+    assert [record['attributes']['Address'] for record in spatial_data] == ['1 World Way']
+
+    requested = []
+
+    class Response:
+        def __init__(self, url):
+            self.url = url
+
+        def json(self):
+            return {'locations': [{'location': {'x': -118.4, 'y': 33.9}, 'attributes': {'ResultID': 1}}]}
+
+    def get(url):
+        requested.append(url)
+        return Response(url)
+
+    monkeypatch.setattr(processing.requests, 'get', get)
+    monkeypatch.setattr(processing, 'get_credentials', lambda filename: {'access_token': 'token'})
+    locations = processing.generate_spatial_data(processing.chunks(spatial_data, 100), resolved=local_locations)
+
+    assert len(requested) == 1
+    sent = json.loads(requested[0].split('addresses=')[1].split('&token=')[0].replace("'", '"'))
+    assert [record['attributes']['OBJECTID'] for record in sent['records']] == [1]
+    assert sorted(location['attributes']['ResultID'] for location in locations) == [0, 1, 2]
+
+
+def test_nothing_left_for_arcgis(address_index, monkeypatch):
+    monkeypatch.setattr(processing.requests, 'get', lambda url: pytest.fail('ArcGIS was called'))
+    reduced = make_reduced([('200 N Spring St', '90012')])
+    spatial_data = [{'attributes': {'OBJECTID': 0, 'Address': '200 N Spring St'}}]
+    local_locations, spatial_data = processing.geocode_locally(reduced, spatial_data, address_index)
+    assert spatial_data == []
+    assert processing.generate_spatial_data(processing.chunks(spatial_data, 100), resolved=local_locations) == local_locations
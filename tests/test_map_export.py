@@ -0,0 +1,101 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import map_export
+
+
+def make_points(n: int = 200, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Account__r.Name': ['Vendor {}'.format(i) for i in range(n)],
+        'Opportunity__r.Name': ['Opportunity {}'.format(i) for i in range(n)],
+        'Award_Amount__c': rng.lognormal(10, 1, n),
+        'DBE__c': rng.random(n) < 0.3,
+        'MBE__c': rng.random(n) < 0.2,
+        'WBE__c': rng.random(n) < 0.1,
+        'Category': rng.choice(['City', 'County', 'Other'], n),
+        'bid_due_year': rng.choice([2019, 2020], n),
+        'Longitude': rng.uniform(-118.6, -118.1, n),
+        'Latitude': rng.uniform(33.8, 34.3, n),
+    })
+
+
+def test_hilbert_index_order_one():
+    # The order-1 curve visits (0, 0), (0, 1), (1, 1), (1, 0)
+    x, y = np.array([0, 0, 1, 1]), np.array([0, 1, 1, 0])
+    assert map_export.hilbert_index(x, y, order=1).tolist() == [0, 1, 2, 3]
+
+
+def test_hilbert_index_is_a_continuous_curve():
+    order = 4
+    n = 1 << order
+    x, y = np.meshgrid(np.arange(n), np.arange(n))
+    d = map_export.hilbert_index(x.ravel(), y.ravel(), order)
+    assert sorted(d.tolist()) == list(range(n * n))
+    # Consecutive cells along the curve are neighbours
+    path = np.argsort(d)
+    steps = np.abs(np.diff(x.ravel()[path])) + np.abs(np.diff(y.ravel()[path]))
+    assert (steps == 1).all()
+
+
+def test_sort_by_hilbert():
+    points = make_points()
+    sorted_points = map_export.sort_by_hilbert(points)
+    assert sorted(sorted_points['Account__r.Name']) == sorted(points['Account__r.Name'])
+
+    cells = (1 << map_export.HILBERT_ORDER) - 1
+    lon, lat = sorted_points['Longitude'], sorted_points['Latitude']
+    x = ((lon - lon.min()) / (lon.max() - lon.min()) * cells).round().to_numpy()
+    y = ((lat - lat.min()) / (lat.max() - lat.min()) * cells).round().to_numpy()
+    assert (np.diff(map_export.hilbert_index(x, y)) >= 0).all()
+
+
+def test_geoparquet_round_trip(tmp_path):
+    path = str(tmp_path / 'points.parquet')
+    points = make_points()
+    map_export.write_geoparquet(points, path, row_group_size=50)
+
+    metadata = json.loads(pq.read_schema(path).metadata[b'geo'])
+    assert metadata['columns']['geometry']['bbox'] == pytest.approx([
+        points['Longitude'].min(), points['Latitude'].min(), points['Longitude'].max(), points['Latitude'].max(),
+    ])
+    bbox = (-118.4, 34.0, -118.2, 34.2)
+    found = map_export.read_points_in_bbox(bbox, path, columns=['Account__r.Name'])
+    inside = points[points['Longitude'].between(bbox[0], bbox[2]) & points['Latitude'].between(bbox[1], bbox[3])]
+    assert sorted(found['Account__r.Name']) == sorted(inside['Account__r.Name'])
+
+
+def test_vector_tile_round_trip(tmp_path):
+    mapbox_vector_tile = pytest.importorskip('mapbox_vector_tile')
+    tile_dir = str(tmp_path / 'tiles')
+    points = make_points()
+    map_export.write_vector_tiles(points, tile_dir, min_zoom=0, max_zoom=2)
+
+    with open(os.path.join(tile_dir, '0', '0', '0.mvt'), 'rb') as f:
+        layer = mapbox_vector_tile.decode(f.read(), default_options={'y_coord_down': True})['awards']
+    properties = pd.DataFrame([feature['properties'] for feature in layer['features']])
+    counts = properties.groupby('Category')['count'].sum()
+    assert counts.to_dict() == points['Category'].value_counts().to_dict()
+    assert np.isclose(properties['award_amount'].sum(), points['Award_Amount__c'].sum())
+
+    with open(os.path.join(tile_dir, 'metadata.json')) as f:
+        assert json.load(f)['maxzoom'] == 2
+
+
+def test_export_without_points(tmp_path, monkeypatch):
+    pytest.importorskip('mapbox_vector_tile')
+    os.makedirs(str(tmp_path / 'src'))
+    os.makedirs(str(tmp_path / 'data'))
+    monkeypatch.chdir(str(tmp_path / 'src'))
+    assert map_export.sort_by_hilbert(make_points().head(0)).empty
+
+    # No award was geocoded
+    map_export.export_map_layer(make_points().assign(Latitude=np.nan))
+    assert pq.read_table(str(tmp_path / 'data' / 'award_points.parquet')).num_rows == 0
+    with open(str(tmp_path / 'data' / 'tiles' / 'metadata.json')) as f:
+        assert json.load(f)['bounds'] == map_export.WORLD_BOUNDS
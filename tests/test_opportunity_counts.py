@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import opportunity_counts
+
+
+def make_opp_naics():
+    # Multi-code opportunities (O1 under two construction codes sharing a 4-digit prefix, O2 across
+    # sectors), missing categories and departments, excluded departments and a row without a NAICS code
+    return pd.DataFrame({
+        'Opportunity__r.Id': ['O1', 'O1', 'O2', 'O2', 'O3', 'O4', 'O5', 'O6', 'O7', 'O8'],
+        'Opportunity__r.Account.Name': [
+            'Public Works', 'Public Works', 'Water & Power', 'Water & Power', 'General Services',
+            np.nan, 'Airports, Los Angeles World', 'Public Works', 'General Services', 'Public Works',
+        ],
+        'Opportunity__r.Category__c': [
+            'Construction', 'Construction', 'Commodity', 'Commodity', np.nan,
+            'Personal Services', 'Construction', np.nan, 'Commodity', 'Construction',
+        ],
+        'NAICS_Code__r.Name': [
+            '236220', '236210', '236220', '541330', '236220', '541330', '238210', '238210', '423610', np.nan,
+        ],
+    })
+
+
+def count_with_groupby(df: pd.DataFrame, naics_level: int, exclude_departments: bool) -> pd.DataFrame:
+    """
+    The counts computed the straightforward way, with groupby and a category pivot.
+    """
+    df = df[df['NAICS_Code__r.Name'].notnull()]
+    if exclude_departments:
+        df = df[~df['Opportunity__r.Account.Name'].isin(opportunity_counts.EXCLUDED_DEPARTMENTS)]
+    df = df.assign(naics=df['NAICS_Code__r.Name'].str[:naics_level])
+    counts = df.groupby('naics').agg(**{
+        'Number of Opportunities': ('Opportunity__r.Id', 'size'),
+        'Number of Distinct Opportunities': ('Opportunity__r.Id', 'nunique'),
+    })
+    categories = (
+        df.groupby(['naics', 'Opportunity__r.Category__c']).size()
+        .unstack(fill_value=0)
+        .rename(columns=opportunity_counts.CATEGORY_COLUMNS)
+    )
+    return counts.join(categories).fillna(0).reset_index().rename(columns={'naics': 'Opportunity_NAICS'})
+
+
+@pytest.mark.parametrize('naics_level', opportunity_counts.NAICS_LEVELS)
+@pytest.mark.parametrize('exclude_departments', [True, False])
+def test_published_counts_match_groupby(naics_level, exclude_departments):
+    opp_naics = make_opp_naics()
+    published = opportunity_counts.get_published_counts(opp_naics)
+    counts = (
+        published[(published['naics_level'] == naics_level) & (published['excludes_departments'] == exclude_departments)]
+        .drop(columns=['naics_level', 'excludes_departments'])
+        .reset_index(drop=True)
+    )
+    expected = count_with_groupby(opp_naics, naics_level, exclude_departments)
+    pd.testing.assert_frame_equal(
+        counts[expected.columns].astype({c: 'int64' for c in expected.columns[1:]}),
+        expected.astype({c: 'int64' for c in expected.columns[1:]}),
+        check_dtype=False,
+    )
+
+
+def test_multi_code_opportunities_counted_once_per_prefix():
+    counts = opportunity_counts.count_opportunities(
+        opportunity_counts.encode_opportunities(make_opp_naics()), naics_level=4, exclude_departments=False
+    ).set_index('Opportunity_NAICS')
+    # O1 (twice), O2 and O3 are listed under 2362
+    assert counts.loc['2362', 'Number of Opportunities'] == 4
+    assert counts.loc['2362', 'Number of Distinct Opportunities'] == 3
+
+
+def test_missing_categories_counted_in_totals_only():
+    counts = opportunity_counts.count_opportunities(
+        opportunity_counts.encode_opportunities(make_opp_naics()), naics_level=2, exclude_departments=False
+    ).set_index('Opportunity_NAICS')
+    category_columns = list(opportunity_counts.CATEGORY_COLUMNS.values())
+    assert counts.loc['23', 'Number of Opportunities'] == 6
+    assert counts.loc['23', category_columns].sum() == 4
@@ -0,0 +1,125 @@
+import os
+import json
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import read_api
+
+
+def make_table():
+    return pd.DataFrame({
+        'naics': ['236220', '238210', '541330', '236210'],
+        'sector': ['23', '23', '54', '23'],
+        'count': [5, 2, 9, 7],
+        'share': [0.5, np.nan, 0.25, 1.0],
+    })
+
+
+@pytest.fixture
+def tables(tmp_path, monkeypatch):
+    path = str(tmp_path / 'counts.parquet')
+    make_table().to_parquet(path)
+    monkeypatch.setattr(read_api, 'TABLES', {'counts': path, 'missing': str(tmp_path / 'missing.parquet')})
+    monkeypatch.setattr(read_api, 'LOADED', {})
+    read_api.run_query.cache_clear()
+    yield path
+    read_api.run_query.cache_clear()
+
+
+def get(path: str, query: str = '') -> tuple:
+    status, body = read_api.handle('GET', path, query)
+    return status, json.loads(body)
+
+
+def test_parse_query_is_canonical():
+    assert read_api.parse_query('b=2&a__gte=1&sort=-count,naics&columns=naics&limit=5&offset=10') == (
+        (('a', 'gte', '1'), ('b', 'eq', '2')), ('-count', 'naics'), ('naics',), 5, 10
+    )
+    assert read_api.parse_query('a=1&b=2') == read_api.parse_query('b=2&a=1')
+    # Unknown operators are part of the column name
+    assert read_api.parse_query('my__column=x')[0] == (('my__column', 'eq', 'x'),)
+    assert read_api.parse_query('limit=1000000')[3] == read_api.MAX_LIMIT
+    assert read_api.parse_query('')[3:] == (read_api.DEFAULT_LIMIT, 0)
+
+
+@pytest.mark.parametrize('query', ['limit=abc', 'offset=-1'])
+def test_parse_query_rejects_bad_pagination(query):
+    with pytest.raises(read_api.QueryError):
+        read_api.parse_query(query)
+
+
+def test_list_tables(tables):
+    status, body = get('/tables')
+    assert status == 200
+    assert [(t['name'], t['rows']) for t in body['tables']] == [('counts', 4)]
+    assert body['tables'][0]['columns'] == ['naics', 'sector', 'count', 'share']
+
+
+def test_filter_sort_limit(tables):
+    status, body = get('/tables/counts', 'sector=23&count__gte=5&sort=-count&columns=naics,count')
+    assert status == 200
+    assert body['total'] == 2
+    assert body['rows'] == [{'naics': '236210', 'count': 7}, {'naics': '236220', 'count': 5}]
+
+    _, body = get('/tables/counts', 'naics__in=236220,541330&sort=naics')
+    assert [row['naics'] for row in body['rows']] == ['236220', '541330']
+
+    _, body = get('/tables/counts', 'sort=count&limit=2&offset=1')
+    assert (body['total'], body['limit'], body['offset']) == (4, 2, 1)
+    assert [row['count'] for row in body['rows']] == [5, 7]
+
+    # NaN is sent as null
+    _, body = get('/tables/counts', 'naics=238210')
+    assert body['rows'][0]['share'] is None
+
+
+@pytest.mark.parametrize('path, query, status', [
+    ('/tables/nope', '', 404),
+    ('/tables/missing', '', 404),
+    ('/other', '', 404),
+    ('/tables/counts', 'nope=1', 400),
+    ('/tables/counts', 'sort=-nope', 400),
+    ('/tables/counts', 'columns=naics,nope', 400),
+    ('/tables/counts', 'count=abc', 400),
+    ('/tables/counts', 'limit=abc', 400),
+])
+def test_errors(tables, path, query, status):
+    assert get(path, query)[0] == status
+    assert 'error' in get(path, query)[1]
+
+
+def test_only_get(tables):
+    assert read_api.handle('POST', '/tables/counts', '')[0] == 405
+
+
+def test_cache_invalidated_when_file_changes(tables):
+    _, body = get('/tables/counts', 'sector=23')
+    assert body['total'] == 3
+    _, body = get('/tables/counts', 'sector=23')
+    assert read_api.run_query.cache_info().hits == 1
+
+    # Rewriting the file with a new modification time
+    make_table().assign(sector='54').to_parquet(tables)
+    stat = os.stat(tables)
+    os.utime(tables, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    _, body = get('/tables/counts', 'sector=23')
+    assert body['total'] == 0
+    assert read_api.LOADED['counts'][0] == read_api.get_fingerprint('counts')
+
+
+def test_asgi_app(tables):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': '/tables/counts', 'query_string': b'limit=1'}
+    asyncio.run(read_api.app(scope, receive, send))
+    assert messages[0]['status'] == 200
+    assert json.loads(messages[1]['body'])['rows'] == [{'naics': '236220', 'sector': '23', 'count': 5, 'share': 0.5}]
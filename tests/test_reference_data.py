@@ -0,0 +1,137 @@
+import os
+import json
+
+import pandas as pd
+import pytest
+
+import reference_data
+
+CATALOG = {
+    'metadata': {'reference_datasets': {
+        'businesses': {'catalog': 'la_open_data', 'identifier': '6rrh-rzua'},
+        'zip_codes': {'catalog': 'county', 'identifier': 'zips'},
+    }},
+    'sources': {
+        'la_open_data': {'driver': 'dcat', 'args': {'url': 'https://data.lacity.org/data.json'}},
+        'county': {'driver': 'dcat', 'args': {'url': 'https://county.example/data.json'}},
+    },
+}
+
+FEEDS = {
+    'https://data.lacity.org/data.json': {'dataset': [
+        {'identifier': 'https://data.lacity.org/api/views/abcd-efgh', 'title': 'Other'},
+        {'identifier': 'https://data.lacity.org/api/views/6rrh-rzua', 'title': 'Active Businesses',
+         'modified': '2024-01-01'},
+    ]},
+    'https://county.example/data.json': {'dataset': [
+        {'identifier': 'https://county.example/datasets/zips', 'title': 'ZIP Codes', 'distribution': [
+            {'mediaType': 'application/json', 'downloadURL': 'https://county.example/zips.json'},
+            {'mediaType': 'text/csv', 'downloadURL': 'https://county.example/zips.csv'},
+        ]},
+    ]},
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes = b'', headers: dict = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class FakeServer:
+    """
+    Stands in for `requests.get`: serves the catalog feeds and CSV files with an ETag, and answers
+    304 to requests revalidating the current ETag.
+    """
+
+    def __init__(self):
+        self.files = {url: json.dumps(feed).encode() for url, feed in FEEDS.items()}
+        self.etags = {url: '"v1"' for url in self.files}
+        self.calls = []
+
+    def publish(self, url: str, content: bytes, etag: str) -> None:
+        self.files[url] = content
+        self.etags[url] = etag
+
+    def get(self, url, params=None, headers=None):
+        self.calls.append((url, params, dict(headers or {})))
+        if (headers or {}).get('If-None-Match') == self.etags[url]:
+            return FakeResponse(304)
+        return FakeResponse(200, self.files[url], {'ETag': self.etags[url], 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+
+    def downloads(self, url: str) -> int:
+        return sum(1 for u, _, headers in self.calls if u == url and 'If-None-Match' not in headers)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(reference_data.requests, 'get', server.get)
+    monkeypatch.setattr(reference_data, 'load_catalog', lambda catalog_file=None: CATALOG)
+    return server
+
+
+SOCRATA_URL = 'https://data.lacity.org/resource/6rrh-rzua.csv'
+
+
+def test_socrata_id_maps_to_resource_export(server, tmp_path):
+    dataset = reference_data.resolve_dataset('businesses', CATALOG, str(tmp_path))
+    assert dataset['url'] == SOCRATA_URL
+    assert dataset['params'] == {'$limit': reference_data.SOCRATA_ROW_LIMIT}
+    assert dataset['title'] == 'Active Businesses'
+
+
+def test_csv_distribution_for_other_portals(server, tmp_path):
+    dataset = reference_data.resolve_dataset('zip_codes', CATALOG, str(tmp_path))
+    assert dataset['url'] == 'https://county.example/zips.csv'
+    assert dataset['params'] is None
+
+
+def test_missing_snapshot_resolves_catalog_and_writes_it(server, tmp_path):
+    server.publish(SOCRATA_URL, b'NAICS,zip_code\n236220,90012\n', '"b1"')
+    data = reference_data.get_reference_data('businesses', reference_dir=str(tmp_path))
+
+    assert data.to_dict('list') == {'NAICS': ['236220'], 'zip_code': ['90012']}
+    assert server.downloads('https://data.lacity.org/data.json') == 1
+    assert server.calls[-1] == (SOCRATA_URL, {'$limit': reference_data.SOCRATA_ROW_LIMIT}, {})
+    pd.testing.assert_frame_equal(pd.read_parquet(str(tmp_path / 'businesses.parquet')), data)
+    with open(str(tmp_path / 'businesses.json')) as f:
+        metadata = json.load(f)
+    assert metadata['etag'] == '"b1"'
+    assert metadata['rows'] == 1
+
+
+def test_not_modified_reuses_snapshot(server, tmp_path):
+    server.publish(SOCRATA_URL, b'NAICS,zip_code\n236220,90012\n', '"b1"')
+    first = reference_data.get_reference_data('businesses', reference_dir=str(tmp_path))
+    n_calls = len(server.calls)
+
+    second = reference_data.get_reference_data('businesses', reference_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(second, first)
+    # Only the dataset was revalidated: no catalog request, no second download
+    assert len(server.calls) == n_calls + 1
+    assert server.calls[-1][2]['If-None-Match'] == '"b1"'
+    assert server.downloads(SOCRATA_URL) == 1
+
+
+def test_new_version_is_downloaded(server, tmp_path):
+    server.publish(SOCRATA_URL, b'NAICS,zip_code\n236220,90012\n', '"b1"')
+    reference_data.get_reference_data('businesses', reference_dir=str(tmp_path))
+
+    server.publish(SOCRATA_URL, b'NAICS,zip_code\n236220,90012\n541330,91101\n', '"b2"')
+    data = reference_data.get_reference_data('businesses', reference_dir=str(tmp_path))
+    assert data['NAICS'].tolist() == ['236220', '541330']
+    assert pd.read_parquet(str(tmp_path / 'businesses.parquet'))['NAICS'].tolist() == ['236220', '541330']
+    with open(str(tmp_path / 'businesses.json')) as f:
+        assert json.load(f)['etag'] == '"b2"'
+
+
+def test_unknown_identifier(server, tmp_path):
+    catalog = {**CATALOG, 'metadata': {'reference_datasets': {'missing': {'catalog': 'county', 'identifier': 'nope'}}}}
+    with pytest.raises(KeyError):
+        reference_data.resolve_dataset('missing', catalog, str(tmp_path))
@@ -0,0 +1,162 @@
+import os
+import json
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import save_files
+from fake_sheets import FakeSheetsClient
+
+
+def trim(grid: list) -> list:
+    """
+    Drops trailing empty cells and rows so grids compare like worksheet contents.
+    """
+    rows = []
+    for row in grid:
+        row = list(row)
+        while row and row[-1] == '':
+            row.pop()
+        rows.append(row)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def apply_rectangles(old: list, rectangles: list) -> list:
+    cells = {(r, c): value for r, row in enumerate(old) for c, value in enumerate(row)}
+    for r0, r1, c0, c1, values in rectangles:
+        assert len(values) == r1 - r0 + 1
+        for i, row in enumerate(values):
+            assert len(row) == c1 - c0 + 1
+            for j, value in enumerate(row):
+                cells[(r0 + i, c0 + j)] = value
+    n_rows = max([r + 1 for r, _ in cells] or [0])
+    n_cols = max([c + 1 for _, c in cells] or [0])
+    return [[cells.get((r, c), '') for c in range(n_cols)] for r in range(n_rows)]
+
+
+def random_grid(rng: random.Random) -> list:
+    n_rows, n_cols = rng.randint(0, 8), rng.randint(1, 6)
+    return [[rng.choice(['a', 'b', 'c', '1']) for _ in range(rng.randint(0, n_cols))] for _ in range(n_rows)]
+
+
+@pytest.mark.parametrize('col, letters', [(1, 'A'), (26, 'Z'), (27, 'AA'), (52, 'AZ'), (703, 'AAA')])
+def test_column_letter(col, letters):
+    assert save_files.column_letter(col) == letters
+
+
+def test_diff_grids_replays_to_new_grid():
+    rng = random.Random(0)
+    for _ in range(2000):
+        old, new = random_grid(rng), random_grid(rng)
+        rectangles = save_files.diff_grids(old, new)
+        assert trim(apply_rectangles(old, rectangles)) == trim(new)
+
+
+def test_diff_grids_merges_consecutive_rows():
+    old = [['a', 'b'], ['c', 'd'], ['e', 'f']]
+    new = [['a', 'x'], ['c', 'y'], ['e', 'f']]
+    assert save_files.diff_grids(old, new) == [(0, 1, 1, 1, [['x'], ['y']])]
+
+
+def test_diff_grids_identical_grids():
+    grid = [['a', 'b'], ['c', 'd']]
+    assert save_files.diff_grids(grid, grid) == []
+
+
+@pytest.fixture
+def client():
+    return FakeSheetsClient()
+
+
+def make_df(n_rows: int, n_cols: int = 3) -> pd.DataFrame:
+    return pd.DataFrame(
+        np.arange(n_rows * n_cols).reshape(n_rows, n_cols),
+        columns=['col{}'.format(i) for i in range(n_cols)]
+    )
+
+
+def test_publish_writes_dataframe_and_grows_worksheet(client, tmp_path):
+    df = make_df(10, 5)
+    publisher = save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path))
+    publisher.update(df, 2)
+    assert publisher.publish() > 0
+
+    worksheet = client.open('Procurement Data New')[2]
+    assert worksheet.get_grid() == save_files.dataframe_to_grid(df)
+    assert worksheet.rows >= 11 and worksheet.cols >= 5
+    assert len(client.sheet.requests) == 1
+
+
+def test_publish_batches_several_worksheets(client, tmp_path):
+    publisher = save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path))
+    publisher.update(make_df(3), 3)
+    publisher.update(make_df(4), 4)
+    publisher.publish()
+
+    assert len(client.sheet.requests) == 1
+    spreadsheet = client.open('Procurement Data New')
+    assert spreadsheet[3].get_grid() == save_files.dataframe_to_grid(make_df(3))
+    assert spreadsheet[4].get_grid() == save_files.dataframe_to_grid(make_df(4))
+
+
+def test_publish_writes_snapshot(client, tmp_path):
+    df = make_df(3)
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(df, 1)
+
+    with open(os.path.join(str(tmp_path), 'Procurement Data New_1.json')) as f:
+        assert json.load(f) == save_files.dataframe_to_grid(df)
+
+
+def test_publish_only_sends_changed_cells(client, tmp_path):
+    df = make_df(6)
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(df, 0)
+
+    # Unchanged data sends nothing
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(df, 0)
+    assert len(client.sheet.requests) == 1
+
+    # A single changed cell sends a single one-cell range
+    changed = df.copy()
+    changed.iloc[2, 1] = -1
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(changed, 0)
+    assert len(client.sheet.requests) == 2
+    assert client.sheet.requests[-1]['data'] == [
+        {'range': "'Sheet0''s'!B4:B4", 'majorDimension': 'ROWS', 'values': [['-1']]}
+    ]
+    assert client.open('Procurement Data New')[0].get_grid() == save_files.dataframe_to_grid(changed)
+
+
+def test_publish_clears_shrunk_grid(client, tmp_path):
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(make_df(8, 4), 0)
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(make_df(3, 2), 0)
+
+    assert client.open('Procurement Data New')[0].get_grid() == save_files.dataframe_to_grid(make_df(3, 2))
+
+
+def test_full_rewrites_every_cell(client, tmp_path):
+    df = make_df(4)
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(df, 0)
+
+    # Hand edit in the sheet that the snapshot doesn't know about
+    worksheet = client.open('Procurement Data New')[0]
+    worksheet.cells[(1, 1)] = 'edited'
+
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path)) as publisher:
+        publisher.update(df, 0)
+    assert worksheet.cells[(1, 1)] == 'edited'
+
+    with save_files.SheetPublisher('Procurement Data New', client=client, snapshot_dir=str(tmp_path), full=True) as publisher:
+        publisher.update(df, 0)
+    assert client.sheet.requests[-1]['data'][0]['range'] == "'Sheet0''s'!A1:C5"
+    assert worksheet.get_grid() == save_files.dataframe_to_grid(df)
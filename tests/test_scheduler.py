@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import scheduler
+
+
+def test_resolve_branches_adds_dependencies():
+    assert scheduler.resolve_branches(['geography_publish']) == ['naics', 'geography_businesses', 'geography_publish']
+
+
+def test_resolve_branches_defaults_to_all():
+    assert scheduler.resolve_branches() == list(scheduler.BRANCHES)
+
+
+def test_resolve_branches_unknown():
+    with pytest.raises(KeyError):
+        scheduler.resolve_branches(['nope'])
+
+
+def produce():
+    return 'businesses'
+
+
+def consume(produce):
+    assert produce == 'businesses'
+
+
+def test_run_branches_passes_results_of_pulled_in_dependencies(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler, 'BRANCHES', {
+        'produce': (produce, []),
+        'consume': (consume, ['produce']),
+    })
+    monkeypatch.setattr(scheduler, 'share_artifacts', lambda: None)
+    os.makedirs(str(tmp_path / 'src'))
+    monkeypatch.chdir(str(tmp_path / 'src'))
+
+    seconds = scheduler.run_branches(['consume'], max_workers=2)
+    assert set(seconds) == {'produce', 'consume'}
+
+
+def configure(setting=None, produce=None):
+    assert produce == 'businesses'
+    assert setting == 'value'
+
+
+def test_run_branches_passes_options(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler, 'BRANCHES', {
+        'produce': (produce, []),
+        'configure': (configure, ['produce']),
+    })
+    monkeypatch.setattr(scheduler, 'share_artifacts', lambda: None)
+    os.makedirs(str(tmp_path / 'src'))
+    monkeypatch.chdir(str(tmp_path / 'src'))
+
+    seconds = scheduler.run_branches(['configure'], max_workers=2, options={
+        'configure': {'setting': 'value'},
+        'produce': {'ignored': None},
+    })
+    assert set(seconds) == {'produce', 'configure'}
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sketches
+
+
+def make_all_data():
+    # Award C1 is listed under two construction codes, C2 under one construction and one utility code
+    return pd.DataFrame({
+        'Contract_Award_ID__c': ['C1', 'C1', 'C2', 'C2', 'C3'],
+        'Opportunity__r.Id': ['O1', 'O1', 'O2', 'O2', 'O3'],
+        'Opportunity_NAICS': ['236220', '238210', '236220', '221310', '236220'],
+        'Opportunity__r.Category__c': ['Construction'] * 5,
+        'bid_due_year_month': ['2020-08'] * 5,
+        'Award_Amount__c': [100.0, 100.0, 300.0, 300.0, 500.0],
+    })
+
+
+def get_awards(quantiles, naics):
+    return quantiles.set_index('naics').loc[naics, 'awards']
+
+
+def test_multi_code_awards_counted_once_per_sector():
+    base = sketches.build_sketches(make_all_data())
+    sectors = sketches.get_quantiles(sketches.rollup(base, 2, 'year', False))
+    assert get_awards(sectors, '23') == 3
+    assert get_awards(sectors, '22') == 1
+    assert sectors.set_index('naics').loc['23', 'p50'] == 300
+
+    codes = sketches.get_quantiles(sketches.rollup(base, 6, 'year', False))
+    assert get_awards(codes, '236220') == 3
+    assert get_awards(codes, '238210') == 1
+
+    everything = sketches.get_quantiles(sketches.rollup(base, None, 'year', False))
+    assert get_awards(everything, 'All') == 3
+
+
+def test_rollup_needs_base_sketches_at_the_level():
+    base = sketches.build_sketches(make_all_data())
+    with pytest.raises(ValueError):
+        sketches.rollup(base, 4)
+
+
+def test_empty_input_gives_empty_outputs(tmp_path, monkeypatch):
+    os.makedirs(str(tmp_path / 'src'))
+    os.makedirs(str(tmp_path / 'data'))
+    monkeypatch.chdir(str(tmp_path / 'src'))
+
+    quantiles = sketches.main(all_data=make_all_data().head(0))
+    assert quantiles.empty
+    assert quantiles.columns.tolist() == ['naics_level', 'period_type', 'naics', 'category', 'period', 'awards', 'min', 'max', 'p50', 'p90']
+    assert pd.read_parquet(str(tmp_path / 'data' / 'award_amount_quantiles.parquet')).empty
+    assert pd.read_parquet(str(tmp_path / 'data' / 'award_amount_sketches.parquet')).empty
+
+
+def test_merged_quantiles_match_exact_quantiles():
+    rng = np.random.default_rng(0)
+    n = 5000
+    amounts = rng.lognormal(11, 1.5, n)
+    all_data = pd.DataFrame({
+        'Contract_Award_ID__c': ['C{}'.format(i) for i in range(n)],
+        'Opportunity__r.Id': ['O{}'.format(i) for i in range(n)],
+        'Opportunity_NAICS': rng.choice(['236220', '238210', '237310'], n),
+        'Opportunity__r.Category__c': rng.choice(['Construction', 'Commodity'], n),
+        'bid_due_year_month': rng.choice(['2020-{:02d}'.format(m) for m in range(1, 13)], n),
+        'Award_Amount__c': amounts,
+    })
+    # 72 base sketches merged into one per sector and year
+    base = sketches.build_sketches(all_data)
+    quantiles = sketches.get_quantiles(sketches.rollup(base, 2, 'year', False)).iloc[0]
+
+    assert quantiles['awards'] == n
+    assert quantiles['min'] == amounts.min()
+    assert quantiles['max'] == amounts.max()
+    assert quantiles['p50'] == pytest.approx(np.quantile(amounts, 0.5), rel=0.02)
+    assert quantiles['p90'] == pytest.approx(np.quantile(amounts, 0.9), rel=0.02)
@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+
+import temporal
+from fake_sheets import FakeSheetsClient
+
+
+def make_all_data():
+    return pd.DataFrame({
+        'DBE__c': [True, False, False, True],
+        'MBE__c': [False, False, True, False],
+        'WBE__c': [False, True, False, False],
+        'Award_Amount__c': [100.0, 300.0, 50.0, 150.0],
+        'bid_due_year': [2019, 2019, 2020, 2020],
+        'bid_due_year_month': ['2019-03', '2019-07', '2020-01', '2020-01'],
+    })
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    os.makedirs(str(tmp_path / 'src'))
+    os.makedirs(str(tmp_path / 'data'))
+    monkeypatch.chdir(str(tmp_path / 'src'))
+    return tmp_path
+
+
+def test_full_run_publishes(workdir):
+    client = FakeSheetsClient()
+    temporal.main(all_data=make_all_data(), client=client)
+
+    by_year = pd.read_parquet(str(workdir / 'data' / 'percents_by_year.parquet'))
+    assert by_year['timeframe'].tolist() == [2019, 2020]
+    assert by_year['percent_dbe_dollars'].tolist() == [25.0, 75.0]
+    assert len(client.sheet.requests) == 1
+
+    worksheets = client.open('Procurement Data New').worksheets
+    assert [row[0] for row in worksheets[3].get_grid()[1:]] == ['2019', '2020']
+    assert len(worksheets[4].get_grid()) == 4
+
+
+def test_year_run_keeps_the_published_history(workdir):
+    client = FakeSheetsClient()
+    temporal.main(all_data=make_all_data(), client=client)
+    published = [w.get_grid() for w in client.open('Procurement Data New').worksheets]
+    full_history = pd.read_parquet(str(workdir / 'data' / 'percents_by_year.parquet'))
+
+    year_data = make_all_data()
+    temporal.main(years=[2020], all_data=year_data[year_data['bid_due_year'] == 2020], client=client)
+
+    assert len(client.sheet.requests) == 1
+    assert [w.get_grid() for w in client.open('Procurement Data New').worksheets] == published
+    pd.testing.assert_frame_equal(pd.read_parquet(str(workdir / 'data' / 'percents_by_year.parquet')), full_history)
+    by_year = pd.read_parquet(str(workdir / 'data' / 'percents_by_year_2020.parquet'))
+    assert by_year['timeframe'].tolist() == [2020]
+    assert os.path.exists(str(workdir / 'data' / 'percents_by_month_2020.parquet'))
+
+
+def test_get_output_path():
+    assert temporal.get_output_path(temporal.PERCENTS_BY_YEAR_FILE) == '../data/percents_by_year.parquet'
+    assert temporal.get_output_path(temporal.PERCENTS_BY_MONTH_FILE, [2020, 2019]) == '../data/percents_by_month_2019_2020.parquet'
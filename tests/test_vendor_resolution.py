@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+import vendor_resolution
+
+
+def resolve(*vendors):
+    """
+    Resolves (name, street, ZIP code) vendor records and returns the vendor id of each.
+    """
+    awards = pd.DataFrame(list(vendors), columns=vendor_resolution.VENDOR_COLUMNS)
+    return vendor_resolution.resolve_vendors(awards).tolist()
+
+
+@pytest.mark.parametrize('left, right', [
+    (('Acme Construction Inc.', '100 Main St', '90012'), ('ACME CONSTRUCTION, LLC', '5 Elm St', '90245')),
+    (('Smith & Sons Plumbing', None, None), ('Smith and Sons Plumbing Inc', None, None)),
+    (('Metro Paving Co', '12 1st St', '90012'), ('Metro Paving Company', '12 1st St', '90012-1234')),
+    (('Vendor 107 LLC', '1 A St', '90012'), ('VENDOR 107, INC.', '9 B St', '91101')),
+    # Close names confirmed by the same ZIP code and house number
+    (('Pacific Builders', '250 Spring St', '90012'), ('Pacific Builder', '250 Spring Street', '90012')),
+])
+def test_matches(left, right):
+    first, second = resolve(left, right)
+    assert first == second
+
+
+@pytest.mark.parametrize('left, right', [
+    # Different numbers in the names, even at the same address
+    (('Vendor 107 LLC', '1 A St', '90012'), ('Vendor 1071 LLC', '1 A St', '90012')),
+    (('Vendor 12 LLC', '1 A St', '90012'), ('Vendor LLC', '1 A St', '90012')),
+    # The address doesn't make up for dissimilar names
+    (('ABC Electric', '10 Main St', '90012'), ('ABD Electric', '10 Main St', '90012')),
+    (('Westside Roofing', '3 Oak St', '90012'), ('Eastside Roofing', '3 Oak St', '90012')),
+    # Close names without an address to confirm them
+    (('Pacific Builders', '250 Spring St', '90012'), ('Pacific Builder', '17 Hope St', '90012')),
+    (('Johnson Landscaping', None, '90012'), ('Johnson Landscaping Services', None, '90012')),
+])
+def test_non_matches(left, right):
+    first, second = resolve(left, right)
+    assert first != second
+
+
+def test_vendor_ids_do_not_depend_on_row_order():
+    vendors = [
+        ('Acme Construction Inc.', '100 Main St', '90012'),
+        ('ABC Electric', '10 Main St', '90012'),
+        ('ACME CONSTRUCTION, LLC', '5 Elm St', '90245'),
+    ]
+    assert resolve(*vendors) == resolve(*vendors[::-1])[::-1]